@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the verification, the matching and the LaTeX generation.
+
+Every benchmark is timed separately using time.perf_counter(), without
+running pdflatex, so that a regression can be found in the part of the
+program it comes from. Text functions are timed on synthetic expressions of
+growing size, and whole verifications are also timed on generated stress
+libraries (a deep chain of theorems, each one proven using the previous one,
+and a wide fan-out, where one theorem uses many others), so that the scaling
+behaviour can be tracked over time.
+
+Run it with:
+    python benchmark.py [--repeat N] [--sizes 10 100 1000] [--json FILE]
+
+CONSTANTS
+*********
+- LETTERS: the letters used as unknowns in synthetic expressions.
+- DEFAULT_SIZES: the sizes of the synthetic expressions and libraries.
+- DEFAULT_REPEAT: how many times each benchmark is run.
+- SEED: the seed of the random generator, fixed so that every run verifies
+        the same proofs.
+
+Created on Sat Oct 17 16:12:05 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+import argparse
+import json
+import random as rng
+import statistics
+import sys
+import time
+import types
+
+import latex_gestion as tex
+import text_gestion as tg
+import theorem as thm
+import theorem_graph as tgraph
+import theorem_group as tgroup
+import theorem_set as thmset
+from proof import Proof
+
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+DEFAULT_SIZES = [10, 100, 1000]
+
+DEFAULT_REPEAT = 5
+
+SEED = 1729
+
+
+class BenchmarkResult:
+    """
+    Timings of one benchmark.
+
+    Attributes
+    **********
+    - name: the name of the benchmark, such as "only_one_modification".
+    - size: the size of its input (number of terms, of theorems...), or None.
+    - timings: the duration of every run, in seconds.
+    """
+
+    def __init__(self, name, size, timings):
+        """
+        Instanciates the attributes.
+        """
+        self.name = name
+        self.size = size
+        self.timings = timings
+
+    def best(self):
+        """
+        Returns the duration of the fastest run, which is the least
+        disturbed by the rest of the system.
+        """
+        return min(self.timings)
+
+    def mean(self):
+        """
+        Returns the mean duration of the runs.
+        """
+        return statistics.mean(self.timings)
+
+    def to_dict(self):
+        """
+        Returns this result as a dictionary that can be written in JSON.
+        """
+        return {'name': self.name, 'size': self.size,
+                'best': self.best(), 'mean': self.mean(),
+                'timings': self.timings}
+
+
+def reset_verification():
+    """
+    Forgets every verified proof, so that the next instantiation of a
+    theorem verifies it (and its dependencies) again.
+    """
+    thm.VERIFIED_PROOFS.clear()
+    thm.VERIFICATION_STACK.clear()
+    tgraph.VERIFICATION_GRAPH = tgraph.TheoremGraph()
+
+
+def measure(name, size, function, repeat, setup=None):
+    """
+    Runs function() repeat times, calling setup() before each run without
+    timing it, and returns a BenchmarkResult.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        beginning_time = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - beginning_time)
+    return BenchmarkResult(name, size, timings)
+
+
+def make_term(index):
+    """
+    Returns the index-th term of a synthetic expression. Terms use sums,
+    products, powers and parenthesis, so that every part of the text
+    functions is used.
+    """
+    first = LETTERS[index % 26]
+    second = LETTERS[(index + 1) % 26]
+    third = LETTERS[(index + 2) % 26]
+    shapes = ["{}*({}+{})", "({}+{})^2*{}", "{}^({}+1)+{}"]
+    return shapes[index % len(shapes)].format(first, second, third)
+
+
+def make_expression(size):
+    """
+    Returns a synthetic expression (without spaces) of size terms.
+    """
+    return "+".join(make_term(index) for index in range(size))
+
+
+def make_modification(size):
+    """
+    Returns an old expression of size terms, the new expression obtained by
+    putting its middle term between parenthesis, and this modification.
+    """
+    terms = [make_term(index) for index in range(size)]
+    middle = size // 2
+    old_statement = "+".join(terms)
+    modification = terms[middle] + "=(" + terms[middle] + ")"
+    terms[middle] = "(" + terms[middle] + ")"
+    return old_statement, "+".join(terms), modification
+
+
+def make_library(name, classes):
+    """
+    Returns a module named name holding the theorem classes given, and
+    registers it in sys.modules so that TheoremGroup.add_all_theorems() can
+    be used on it.
+    """
+    module = types.ModuleType(name)
+    for theorem_class in classes:
+        theorem_class.__module__ = name
+        setattr(module, theorem_class.__name__, theorem_class)
+    sys.modules[name] = module
+    return module
+
+
+def make_commutativity_theorem(class_name, proof_theorems):
+    """
+    Returns a theorem class stating that a*b = b*a, whose proof uses every
+    theorem class of proof_theorems once (each of them must also state that
+    a*b = b*a).
+    """
+
+    def __init__(self, param_list):
+        thm.Equality.__init__(self, param_list,
+                              name="the generated theorem " + class_name,
+                              conclusion='a*b = b*a',
+                              unknowns=['a', 'b'])
+
+    def get_proof(self):
+        proof = Proof(self, 'a*b')
+        current, other = 'a', 'b'
+        for proof_theorem in proof_theorems:
+            proof.evolve_equality(other + '*' + current,
+                                  current + '*' + other + '='
+                                  + other + '*' + current,
+                                  proof_theorem([current, other]))
+            current, other = other, current
+        proof.conclude()
+        return proof
+
+    return type(class_name, (thm.Equality,),
+                {'__init__': __init__, 'get_proof': get_proof})
+
+
+def make_chain_library(depth):
+    """
+    Returns a library of depth theorems, where the first one is proven using
+    thmset.ProductCommutativity and every other one using the previous one.
+    """
+    classes = []
+    previous = thmset.ProductCommutativity
+    for index in range(depth):
+        previous = make_commutativity_theorem("Chain{:05d}".format(index),
+                                              [previous])
+        classes.append(previous)
+    return make_library("stress_chain_{}".format(depth), classes)
+
+
+def make_fan_out_library(width):
+    """
+    Returns a library of width theorems proven using
+    thmset.ProductCommutativity, and one more theorem whose proof uses all
+    of them.
+    """
+    leaves = [make_commutativity_theorem("Leaf{:05d}".format(index),
+                                         [thmset.ProductCommutativity])
+              for index in range(width)]
+    root = make_commutativity_theorem("Root", leaves)
+    return make_library("stress_fan_out_{}".format(width), leaves + [root])
+
+
+def library_classes(module):
+    """
+    Returns the theorem classes of a module, as add_all_theorems() finds them.
+    """
+    return thm.module_theorem_classes(module)
+
+
+def add_all_theorems(module):
+    """
+    Verifies every theorem of a module and adds it to a new TheoremGroup.
+    """
+    rng.seed(SEED)
+    tgroup.TheoremGroup("Benchmark").add_all_theorems(module)
+
+
+def benchmark_instantiation(repeat):
+    """
+    Times the verification of every theorem of theorem_set.py, each time
+    from scratch (this includes verifying its dependencies).
+    """
+    results = []
+    for theorem_class in library_classes(thmset):
+        def instantiate(theorem_class=theorem_class):
+            rng.seed(SEED)
+            theorem_class(None)
+        results.append(measure("instantiate " + theorem_class.__name__, None,
+                               instantiate, repeat, reset_verification))
+    return results
+
+
+def benchmark_text_functions(sizes, repeat):
+    """
+    Times the text functions used during verification and LaTeX generation
+    on synthetic expressions of growing size.
+    """
+    results = []
+    for size in sizes:
+        expression = make_expression(size)
+        old_statement, new_statement, modification = make_modification(size)
+        replacements = {'a': '(x+y)', 'b': 'c', 'c': 'b'}
+
+        results.append(measure(
+            "only_one_modification", size,
+            lambda: tg.only_one_modification(old_statement, new_statement,
+                                             modification),
+            repeat))
+        results.append(measure("verify_maths", size,
+                               lambda: tg.verify_maths(expression), repeat))
+        results.append(measure(
+            "replace_using_dict", size,
+            lambda: tg.replace_using_dict(expression, replacements), repeat))
+        results.append(measure("convert_2_latex", size,
+                               lambda: tex.convert_2_latex(expression),
+                               repeat))
+    return results
+
+
+def benchmark_libraries(sizes, repeat):
+    """
+    Times TheoremGroup.add_all_theorems() on theorem_set.py and on the
+    generated stress libraries, verifying everything from scratch.
+    """
+    results = [measure("add_all_theorems theorem_set", None,
+                       lambda: add_all_theorems(thmset), repeat,
+                       reset_verification)]
+    for size in sizes:
+        for name, make in [("chain", make_chain_library),
+                           ("fan-out", make_fan_out_library)]:
+            module = make(size)
+            results.append(measure("add_all_theorems " + name, size,
+                                   lambda: add_all_theorems(module), repeat,
+                                   reset_verification))
+    return results
+
+
+def run_benchmarks(sizes=None, repeat=DEFAULT_REPEAT):
+    """
+    Runs every benchmark and returns the list of their BenchmarkResult.
+    The verification cache is disabled while they run.
+    """
+    if sizes is None:
+        sizes = DEFAULT_SIZES
+
+    verification_cache = thm.VERIFICATION_CACHE
+    thm.use_verification_cache(None)
+    try:
+        results = benchmark_instantiation(repeat)
+        results += benchmark_text_functions(sizes, repeat)
+        results += benchmark_libraries(sizes, repeat)
+    finally:
+        thm.use_verification_cache(verification_cache)
+        reset_verification()
+    return results
+
+
+def format_results(results):
+    """
+    Returns the results as a text table, with durations in milliseconds.
+    """
+    lines = ["{:<45} {:>7} {:>12} {:>12}".format("benchmark", "size",
+                                                 "best (ms)", "mean (ms)")]
+    for result in results:
+        size = "" if result.size is None else str(result.size)
+        lines.append("{:<45} {:>7} {:>12.3f} {:>12.3f}".format(
+            result.name, size, 1000*result.best(), 1000*result.mean()))
+    return "\n".join(lines)
+
+
+def main(arguments=None):
+    """
+    Runs the benchmarks, prints their results and optionally saves them in
+    a JSON file, to compare them with the ones of later versions.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="sizes of the synthetic expressions and of the "
+                             "stress libraries")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="number of runs of each benchmark")
+    parser.add_argument("--json", metavar="FILE",
+                        help="file in which the results are saved")
+    arguments = parser.parse_args(arguments)
+
+    results = run_benchmarks(arguments.sizes, arguments.repeat)
+    print(format_results(results))
+
+    if arguments.json is not None:
+        with open(arguments.json, 'w', encoding='utf-8') as file:
+            json.dump([result.to_dict() for result in results], file,
+                      indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Gives an evaluator of numerical expressions, used for simplifications.
+
+Expressions are evaluated on their parsed tree (see expression.py), with
+exact integers and fractions.Fraction, instead of being given to eval().
+Powers are computed right to left (2^3^2 is 2^9), as eval() did with
+'**'. Since a power can get huge very quickly (9^9^9 has more than 300
+million digits), exponents and results are bounded. Results are cached by
+the normal form of the expression (see normal_form.py): trees are interned,
+so an expression evaluated again (such as the simplification of Addition
+instantiated with the same numbers), or only written in another order (such
+as 3 + 2 instead of 2 + 3), is found without evaluating anything.
+
+CONSTANTS
+*********
+- MAX_EXPONENT: the default greatest exponent allowed in a power.
+- MAX_RESULT_DIGITS: the default greatest number of digits allowed in a
+                     result (or in an intermediate result). It is below
+                     the number of digits Python accepts to convert an
+                     integer to a string (see sys.get_int_max_str_digits(),
+                     4300 by default), so that every result can be written.
+- CACHE_SIZE: the number of results kept in the cache.
+
+Created on Sat Oct 17 18:20:31 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+from fractions import Fraction
+from functools import lru_cache
+import math
+
+import expression as expr
+import normal_form as nf
+
+
+MAX_EXPONENT = 10000
+
+MAX_RESULT_DIGITS = 4000
+
+CACHE_SIZE = 4096
+
+NOT_EVALUABLE_MESSAGE = ("The expression '{}' cannot be evaluated. It must "
+                         "only contain numbers, additions, products and "
+                         "powers.")
+
+EVALUATION_LIMIT_MESSAGE = ("The expression '{}' is too big to be evaluated: "
+                            "its exponents must be at most {} and its "
+                            "results must have at most {} digits.")
+
+
+class NotEvaluableError(Exception):
+    """
+    An exception that is thrown when an expression cannot be evaluated,
+    because it contains unknowns or because it makes no sense.
+    """
+
+    def __init__(self, expression):
+        message = NOT_EVALUABLE_MESSAGE
+        message = message.format(expression)
+        super().__init__(message)
+
+
+class EvaluationLimitError(Exception):
+    """
+    An exception that is thrown when an expression would have an exponent
+    or a result that is too big.
+    """
+
+    def __init__(self, expression, max_exponent, max_result_digits):
+        message = EVALUATION_LIMIT_MESSAGE
+        message = message.format(expression, max_exponent, max_result_digits)
+        super().__init__(message)
+
+
+class _LimitExceeded(Exception):
+    """
+    Raised inside the evaluation when a limit is exceeded. It is converted
+    to an EvaluationLimitError, which knows the whole expression.
+    """
+
+
+def number_bits(value):
+    """
+    Returns the number of bits of an integer or of a fraction (the bits of
+    its numerator and of its denominator).
+    """
+    if isinstance(value, Fraction):
+        return (abs(value.numerator).bit_length()
+                + value.denominator.bit_length())
+    return abs(value).bit_length()
+
+
+def normalize_number(value):
+    """
+    Returns a fraction with a denominator of 1 as an integer, and any other
+    number unchanged.
+    """
+    if isinstance(value, Fraction) and value.denominator == 1:
+        return value.numerator
+    return value
+
+
+def power(base, exponent, max_exponent, max_bits):
+    """
+    Returns base^exponent, after verifying that the exponent is an integer
+    of at most max_exponent and that the result has at most about max_bits
+    bits. Raises a _LimitExceeded otherwise, or a ValueError if the result
+    is not a rational number.
+    """
+    if isinstance(exponent, Fraction):
+        # normalize_number() gives integers for every whole fraction
+        raise ValueError(exponent)
+    if abs(exponent) > max_exponent:
+        raise _LimitExceeded
+    if abs(exponent) > 1 and number_bits(base) - 1 > max_bits//abs(exponent):
+        raise _LimitExceeded
+    if exponent < 0:
+        base = Fraction(base)
+    return base**exponent
+
+
+def evaluate_tree(tree, values=None, max_exponent=MAX_EXPONENT,
+                  max_result_digits=MAX_RESULT_DIGITS):
+    """
+    Evaluates an expression tree, replacing its symbols by the numbers given
+    in values (integers or fractions). Returns an integer when the result is
+    whole, and a fraction otherwise. This is not cached: use
+    evaluate_expression() for expressions without unknowns.
+
+    Raises a NotEvaluableError if a symbol has no value or if the result is
+    not a rational number, and an EvaluationLimitError if an exponent or a
+    result is too big.
+    """
+    max_bits = math.ceil(max_result_digits*math.log2(10))
+    if values is None:
+        values = {}
+
+    def evaluate(node):
+        if node.kind == expr.NUMBER:
+            value = int(node.value)
+        elif node.kind == expr.SYMBOL:
+            value = values[node.value]
+        elif node.kind == expr.PARENTHESIS:
+            value = evaluate(node.children[0])
+        elif node.value == '+':
+            value = sum(evaluate(child) for child in node.children)
+        elif node.value == '*':
+            value = 1
+            for child in node.children:
+                value *= evaluate(child)
+                if number_bits(value) > max_bits:
+                    raise _LimitExceeded
+        else:
+            # powers are right associative
+            value = evaluate(node.children[-1])
+            for child in reversed(node.children[:-1]):
+                value = power(evaluate(child), value, max_exponent, max_bits)
+
+        value = normalize_number(value)
+        if number_bits(value) > max_bits:
+            raise _LimitExceeded
+        return value
+
+    try:
+        return evaluate(tree)
+    except _LimitExceeded:
+        raise EvaluationLimitError(tree, max_exponent, max_result_digits)
+    except (KeyError, ValueError, ZeroDivisionError):
+        raise NotEvaluableError(tree)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _evaluate_cached(tree, max_exponent, max_result_digits):
+    """
+    Evaluates an expression tree without unknowns, given in normal form.
+    Trees are interned, so equivalent expressions share the same entry of
+    the cache.
+    """
+    return evaluate_tree(tree, None, max_exponent, max_result_digits)
+
+
+def evaluate_expression(expression, max_exponent=MAX_EXPONENT,
+                        max_result_digits=MAX_RESULT_DIGITS):
+    """
+    Evaluates a mathematical expression without unknowns (such as 1+2^3),
+    giving an exact integer or fraction. Raises a NotEvaluableError if it
+    cannot be evaluated, and an EvaluationLimitError if it is too big.
+    """
+    try:
+        tree = expr.parse(expression)
+    except expr.InvalidExpressionError:
+        raise NotEvaluableError(expression)
+    return _evaluate_cached(nf.normal_form(tree), max_exponent,
+                            max_result_digits)
@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+"""
+Gives an expression parser building hash-consed expression trees.
+
+Expressions are parsed into immutable Node objects. Nodes are interned: two
+equal subexpressions are always represented by the very same object, which
+means that comparing two trees is an identity comparison.
+
+The trees keep the exact structure of the text they come from. Parenthesis
+are kept as nodes, and a chain of operations with the same operator (such as
+a + b + c) is kept as one node with all its operands. Thus, converting a tree
+back to a string gives the original expression without its spaces.
+
+CONSTANTS
+*********
+- NUMBER, SYMBOL, PARENTHESIS, OPERATION: the different kinds of nodes.
+- POWER_EXPONENT: the context of the last operand of a power (see
+                  symbol_contexts()), which is its exponent.
+
+Created on Sat Oct 17 10:12:40 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+from functools import lru_cache
+import string
+import weakref
+
+import text_gestion as tg
+
+
+NUMBER = "number"
+SYMBOL = "symbol"
+PARENTHESIS = "parenthesis"
+OPERATION = "operation"
+
+POWER_EXPONENT = "exponent"
+
+INVALID_EXPRESSION_MESSAGE = ("The expression '{}' could not be parsed. "
+                              "Verify that you use the right characters and "
+                              "that every parenthesis is closed.")
+
+
+class InvalidExpressionError(Exception):
+    """
+    An exception that is thrown when an expression cannot be parsed.
+    """
+
+    def __init__(self, expression):
+        message = INVALID_EXPRESSION_MESSAGE
+        message = message.format(expression)
+        super().__init__(message)
+
+
+class Node:
+    """
+    Immutable node of an expression tree. Nodes must not be instantiated
+    directly: use the make_number(), make_symbol(), make_parenthesis() and
+    make_operation() functions, which intern them.
+
+    Attributes
+    **********
+    - kind: NUMBER, SYMBOL, PARENTHESIS or OPERATION.
+    - value: the digits of a number, the name of a symbol, the operator of
+             an operation or None for a parenthesis.
+    - children: the operands of an operation, the content of a parenthesis,
+                or an empty tuple for numbers and symbols.
+    - text: the expression this node represents, without any space.
+    """
+
+    __slots__ = ('kind', 'value', 'children', 'text', '__weakref__')
+
+    def __init__(self, kind, value, children, text):
+        self.kind = kind
+        self.value = value
+        self.children = children
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return "Node({!r})".format(self.text)
+
+    def __reduce__(self):
+        # Nodes are pickled as their text, so that they get interned again
+        return (parse, (self.text,))
+
+    def is_atom(self):
+        """
+        Returns whether this node is a number or a symbol.
+        """
+        return self.kind in (NUMBER, SYMBOL)
+
+    def operation_order(self):
+        """
+        Returns the order of operation of this node, as defined by
+        tg.OPERATION_ORDER. Atoms and parenthesis bind tighter than any
+        operator, so they get tg.PARENTHESIS_ORDER.
+        """
+        if self.kind == OPERATION:
+            return tg.OPERATION_ORDER[self.value]
+        return tg.PARENTHESIS_ORDER
+
+    def size(self):
+        """
+        Returns the number of nodes in this tree.
+        """
+        return 1 + sum(child.size() for child in self.children)
+
+
+_INTERNED_NODES = weakref.WeakValueDictionary()
+
+
+def _intern(kind, value, children, text):
+    """
+    Returns the unique node having this kind, value and children, creating
+    it if it does not exist yet. Children are already interned, so they can
+    be compared by identity in the key.
+    """
+    key = (kind, value, children)
+    node = _INTERNED_NODES.get(key)
+    if node is None:
+        node = Node(kind, value, children, text)
+        _INTERNED_NODES[key] = node
+    return node
+
+
+def make_number(digits):
+    """
+    Returns the node of a number, given as a string of digits.
+    """
+    return _intern(NUMBER, digits, (), digits)
+
+
+def make_symbol(name):
+    """
+    Returns the node of a symbol (an unknown).
+    """
+    return _intern(SYMBOL, name, (), name)
+
+
+def make_parenthesis(child):
+    """
+    Returns the node of a parenthesis containing the child given.
+    """
+    return _intern(PARENTHESIS, None, (child,), "(" + child.text + ")")
+
+
+def make_operation(operator, operands):
+    """
+    Returns the node of a chain of operations with the same operator.
+    Operands which are themselves chains of the same operator are flattened
+    into this one, which keeps the tree as flat as the text it represents.
+    """
+    flattened = []
+    for operand in operands:
+        if operand.kind == OPERATION and operand.value == operator:
+            flattened.extend(operand.children)
+        else:
+            flattened.append(operand)
+
+    if len(flattened) == 1:
+        return flattened[0]
+
+    children = tuple(flattened)
+    text = operator.join(child.text for child in children)
+    return _intern(OPERATION, operator, children, text)
+
+
+def tokenize(expression):
+    """
+    Splits an expression (without spaces) into tokens, using tg.tokenize().
+    Raises an InvalidExpressionError on an unknown character or on many
+    letters following each others, since an unknown is only one letter.
+    """
+    tokens = tg.tokenize(expression)
+    for token in tokens:
+        if token[0] in string.digits:
+            continue
+        if len(token) != 1 or not (tg.is_letter(token)
+                                   or token in tg.OPERATION_ORDER
+                                   or token in "()"):
+            raise InvalidExpressionError(expression)
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive descent parser following the grammar:
+        sum     := product ('+' product)*
+        product := power ('*' power)*
+        power   := atom ('^' atom)*
+        atom    := number | letter | '(' sum ')'
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.position = 0
+
+    def peek(self):
+        """
+        Returns the current token, or None at the end of the expression.
+        """
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def error(self):
+        """
+        Returns the exception to raise when the expression is not valid.
+        """
+        return InvalidExpressionError(self.expression)
+
+    def parse(self):
+        """
+        Parses the whole expression and returns its tree.
+        """
+        tree = self.parse_chain('+')
+        if self.peek() is not None:
+            raise self.error()
+        return tree
+
+    def parse_chain(self, operator):
+        """
+        Parses a chain of operations using the operator given, whose
+        operands are made of operators with a higher order of operation.
+        """
+        if operator == '+':
+            parse_operand = lambda: self.parse_chain('*')
+        elif operator == '*':
+            parse_operand = lambda: self.parse_chain('^')
+        else:
+            parse_operand = self.parse_atom
+
+        operands = [parse_operand()]
+        while self.peek() == operator:
+            self.position += 1
+            operands.append(parse_operand())
+
+        if len(operands) == 1:
+            return operands[0]
+        # Operands are never chains of the same operator (they would have
+        # been parsed in this loop), so nothing gets flattened here.
+        return make_operation(operator, operands)
+
+    def parse_atom(self):
+        """
+        Parses a number, a letter or an expression between parenthesis.
+        """
+        token = self.peek()
+        if token is None:
+            raise self.error()
+        self.position += 1
+
+        if token == "(":
+            child = self.parse_chain('+')
+            if self.peek() != ")":
+                raise self.error()
+            self.position += 1
+            return make_parenthesis(child)
+        if token[0] in string.digits:
+            return make_number(token)
+        if tg.is_letter(token):
+            return make_symbol(token)
+        raise self.error()
+
+
+@lru_cache(maxsize=4096)
+def _parse_without_spaces(expression):
+    """
+    Parses an expression that does not contain any space.
+    """
+    return _Parser(expression).parse()
+
+
+def parse(expression):
+    """
+    Parses an expression and returns its (interned) tree. Raises an
+    InvalidExpressionError if the expression does not make sense.
+    """
+    return _parse_without_spaces(tg.remove_spaces(expression))
+
+
+def parse_equality(equality):
+    """
+    Parses an equality and returns the trees of both of its sides, or None
+    if it does not have exactly one '=' sign or if a side cannot be parsed.
+    """
+    sides = equality.split('=')
+    if len(sides) != 2:
+        return None
+    try:
+        return parse(sides[0]), parse(sides[1])
+    except InvalidExpressionError:
+        return None
+
+
+@lru_cache(maxsize=1024)
+def symbol_contexts(tree):
+    """
+    Returns a dictionary giving, for each symbol of a tree, the frozenset of
+    the operators of the operations directly containing it. None stands for
+    a symbol that is the whole tree or the content of a parenthesis, and
+    POWER_EXPONENT for the last operand of a power (such as c in a^b^c). Trees
+    are interned, so this is only computed once per expression (such as the
+    side of the conclusion of a theorem class). The result must not be
+    modified.
+    """
+    contexts = {}
+    to_visit = [(tree, None)]
+    while to_visit:
+        node, operator = to_visit.pop()
+        if node.kind == SYMBOL:
+            contexts.setdefault(node.value, set()).add(operator)
+        elif node.kind == PARENTHESIS:
+            to_visit.append((node.children[0], None))
+        elif node.kind == OPERATION:
+            to_visit.extend((child, node.value) for child in node.children)
+            if node.value == '^':
+                to_visit[-1] = (node.children[-1], POWER_EXPONENT)
+    return {symbol: frozenset(operators)
+            for symbol, operators in contexts.items()}
+
+
+def can_replace(replacement, operator):
+    """
+    Returns whether a symbol directly contained in an operation using the
+    operator given (None if it is not in an operation, see
+    symbol_contexts()) can be replaced by the replacement tree without
+    adding parenthesis.
+
+    The replacement must bind tighter than the operator. It can also be an
+    operation using the same operator if this one is associative (+ and *):
+    a*(b*c) written a*b*c is the same product. This is not the case of ^,
+    since a^(b^c) and (a^b)^c are not equal, but powers are right
+    associative: a^b^c is a^(b^c), so the last operand of a power (the
+    POWER_EXPONENT context) can be replaced by a power.
+
+    >>> power = parse('b^c')
+    >>> can_replace(power, POWER_EXPONENT)  # a^x with x = b^c is a^b^c
+    True
+    >>> can_replace(power, '^')  # x^a with x = b^c is not b^c^a
+    False
+    >>> can_replace(parse('b*c'), POWER_EXPONENT)
+    False
+    """
+    if operator is None or replacement.kind != OPERATION:
+        return True
+    if operator == POWER_EXPONENT:
+        operator = '^'
+        if replacement.value == operator:
+            return True
+    if replacement.value == operator:
+        return operator != '^'
+    return tg.OPERATION_ORDER[replacement.value] > tg.OPERATION_ORDER[operator]
+
+
+def substitute(tree, replacements):
+    """
+    Returns the tree where every symbol in the replacements dictionary (by
+    name) is replaced by its tree. Operations are rebuilt with
+    make_operation(), so a replacement using the same operator as its
+    operation is flattened into it, as it would be when parsing the text of
+    the result. Use can_replace() first to know whether the text of the
+    result means the same as the result.
+    """
+    # Equal subtrees are the same node, so each one is only rebuilt once.
+    substituted = {}
+
+    def substitute_node(node):
+        result = substituted.get(node)
+        if result is not None:
+            return result
+        if node.kind == SYMBOL:
+            result = replacements.get(node.value, node)
+        elif node.kind == NUMBER:
+            result = node
+        else:
+            children = [substitute_node(child) for child in node.children]
+            if node.kind == PARENTHESIS:
+                result = make_parenthesis(children[0])
+            else:
+                result = make_operation(node.value, children)
+        substituted[node] = result
+        return result
+
+    return substitute_node(tree)
+
+
+def differences(old_tree, new_tree):
+    """
+    Returns the pairs of subexpressions (old, new) such that replacing old
+    by new in old_tree gives new_tree, the smallest first. Going down from
+    the whole trees, a pair is followed by the parts of its operands that
+    differ, as long as both trees have the same structure around them
+    (consecutive operands of a sum or a product, and last operands of a
+    power, are also subexpressions). An empty list means that the trees are
+    equal.
+    """
+    pairs = []
+    old, new = old_tree, new_tree
+    while old is not new:
+        pairs.append((old, new))
+        if (old.kind != new.kind or old.value != new.value
+                or old.is_atom()):
+            break
+        if old.kind == PARENTHESIS:
+            old, new = old.children[0], new.children[0]
+            continue
+
+        old_operands, new_operands = old.children, new.children
+        shortest = min(len(old_operands), len(new_operands))
+        prefix = 0
+        while (prefix < shortest
+               and old_operands[prefix] is new_operands[prefix]):
+            prefix += 1
+        suffix = 0
+        while (prefix + suffix < shortest
+               and old_operands[-suffix - 1] is new_operands[-suffix - 1]):
+            suffix += 1
+
+        old_part = old_operands[prefix:len(old_operands) - suffix]
+        new_part = new_operands[prefix:len(new_operands) - suffix]
+        if (not old_part or not new_part or prefix + suffix == 0
+                or (old.value == '^' and suffix > 0)):
+            break
+        old = make_operation(old.value, old_part)
+        new = make_operation(new.value, new_part)
+
+    pairs.reverse()
+    return pairs
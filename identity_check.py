@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Gives a fast check that two expressions cannot be equal, by evaluating
+them at random points modulo a prime.
+
+Expressions only use +, * and ^, so an expression whose exponents are
+numbers is a polynomial of its unknowns. Two polynomials that are equal
+have the same value at every point, and this is still true modulo a prime
+(taking values modulo a prime keeps sums and products). Thus, if two
+expressions have different values at one point, they cannot be equal, and
+a step using them can be rejected before looking for the modification in
+the old equality. Conversely, two different polynomials of degree d only
+have the same value at a random point with a probability of at most
+d/PRIME, so false steps are almost never let through (they are then
+rejected by the usual verification anyway).
+
+An exponent containing an unknown (such as in b^(x + y)) cannot be
+evaluated modulo the prime, so such expressions are not checked: the check
+only ever rejects expressions that are certainly not equal.
+
+Values are computed for all the POINTS_NUMBER points at once. When NumPy is
+installed, they are arrays, so that checking many expressions (see
+check_equalities() and check_library()) is vectorized over the points;
+otherwise, they are tuples of Python integers. NumPy is only imported when
+the first values are computed (see get_numpy()), so that importing this
+module stays fast. Trees are interned, so the
+values of an expression (and of each of its subexpressions) are computed
+only once.
+
+The points are drawn from a generator with a fixed seed, so that runs are
+reproducible; use set_seed() to change them. The random module itself is
+not used, since it chooses the sentences of the LaTeX code.
+
+CONSTANTS
+*********
+- PRIME: the prime modulo which expressions are evaluated. It is smaller
+         than 2^31, so that a product of two values fits in 64 bits.
+- POINTS_NUMBER: the number of points at which expressions are evaluated.
+- SEED: the default seed of the generator of the points.
+- CACHE_SIZE: the number of expressions whose values are kept.
+
+Created on Sat Oct 17 23:38:52 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+from functools import lru_cache
+import importlib
+import random
+
+import evaluation
+import expression as expr
+import rewrite_index as rindex
+import theorem as thm
+
+
+PRIME = 2147483647
+
+POINTS_NUMBER = 4
+
+SEED = 1729
+
+CACHE_SIZE = 4096
+
+_GENERATOR = random.Random(SEED)
+
+# Values of every unknown at the points, by name.
+_POINTS = {}
+
+
+def set_seed(seed):
+    """
+    Draws new points, from a generator with the seed given.
+    """
+    _GENERATOR.seed(seed)
+    _POINTS.clear()
+    residues.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_numpy():
+    """
+    Returns the numpy module, or None if it is not installed. It is only
+    imported when the first vector is made, since it takes long to import.
+    """
+    try:
+        import numpy  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    return numpy
+
+
+def make_vector(values):
+    """
+    Returns the vector of values at the points given as a list.
+    """
+    np = get_numpy()
+    if np is not None:
+        return np.array(values, dtype=np.int64)
+    return tuple(values)
+
+
+def constant_vector(value):
+    """
+    Returns the vector of a number, which is the same at every point.
+    """
+    return make_vector([value % PRIME]*POINTS_NUMBER)
+
+
+def unknown_vector(name):
+    """
+    Returns the vector of the values of an unknown at the points.
+    """
+    if name not in _POINTS:
+        _POINTS[name] = make_vector([_GENERATOR.randrange(PRIME)
+                                     for _ in range(POINTS_NUMBER)])
+    return _POINTS[name]
+
+
+def add(first, second):
+    """
+    Returns the sum of two vectors, modulo PRIME.
+    """
+    if get_numpy() is not None:
+        return (first + second) % PRIME
+    return tuple((value + other) % PRIME
+                 for value, other in zip(first, second))
+
+
+def multiply(first, second):
+    """
+    Returns the product of two vectors, modulo PRIME.
+    """
+    if get_numpy() is not None:
+        return (first * second) % PRIME
+    return tuple((value * other) % PRIME
+                 for value, other in zip(first, second))
+
+
+def power(base, exponent):
+    """
+    Returns a vector to a (natural) power, modulo PRIME, by exponentiation
+    by squaring.
+    """
+    result = constant_vector(1)
+    while exponent > 0:
+        if exponent % 2 == 1:
+            result = multiply(result, base)
+        base = multiply(base, base)
+        exponent //= 2
+    return result
+
+
+def are_equal_vectors(first, second):
+    """
+    Returns whether two vectors have the same value at every point.
+    """
+    np = get_numpy()
+    if np is not None:
+        return bool(np.array_equal(first, second))
+    return first == second
+
+
+def exponent_value(tree):
+    """
+    Returns the value of an exponent, or None if it is not a natural number
+    (because it contains an unknown, for instance).
+    """
+    try:
+        value = evaluation.evaluate_tree(tree)
+    except (evaluation.NotEvaluableError, evaluation.EvaluationLimitError):
+        return None
+    if not isinstance(value, int) or value < 0:
+        return None
+    return value
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def residues(tree):
+    """
+    Returns the vector of the values of an expression tree at the points,
+    modulo PRIME, or None if it has an exponent which is not a natural
+    number.
+    """
+    if tree.kind == expr.NUMBER:
+        return constant_vector(int(tree.value))
+    if tree.kind == expr.SYMBOL:
+        return unknown_vector(tree.value)
+    if tree.kind == expr.PARENTHESIS:
+        return residues(tree.children[0])
+
+    if tree.value == '^':
+        # powers are right associative
+        exponent = exponent_value(expr.make_operation('^',
+                                                      tree.children[1:]))
+        base = residues(tree.children[0])
+        if exponent is None or base is None:
+            return None
+        return power(base, exponent)
+
+    combine = add if tree.value == '+' else multiply
+    result = None
+    for child in tree.children:
+        value = residues(child)
+        if value is None:
+            return None
+        result = value if result is None else combine(result, value)
+    return result
+
+
+def expand_definitions(tree, definitions):
+    """
+    Returns the tree where the symbols defined in the definitions (a list
+    of [name, expression], such as the simplifications of a theorem) are
+    replaced by their expression, between parenthesis.
+    """
+    if not definitions:
+        return tree
+    replacements = {name: expr.make_parenthesis(expr.parse(expression))
+                    for name, expression in definitions}
+    return expr.substitute(tree, replacements)
+
+
+def may_be_equal(first, second, definitions=None):
+    """
+    Returns False if two expression trees are certainly not equal, and True
+    otherwise (if they have the same values at the points, or if they
+    cannot be checked). Symbols defined in definitions (see
+    expand_definitions()) are replaced by their expression first.
+    """
+    first_residues = residues(expand_definitions(first, definitions))
+    second_residues = residues(expand_definitions(second, definitions))
+    if first_residues is None or second_residues is None:
+        return True
+    return are_equal_vectors(first_residues, second_residues)
+
+
+def check_equalities(equalities, definitions=None):
+    """
+    Returns, for each equality of a list (as a text such as
+    "a*(b+c) = a*b + a*c"), whether its sides may be equal (see
+    may_be_equal()). An equality that cannot be parsed is False.
+    """
+    results = []
+    for equality in equalities:
+        sides = expr.parse_equality(equality)
+        results.append(sides is not None
+                       and may_be_equal(sides[0], sides[1], definitions))
+    return results
+
+
+def check_library(library=None):
+    """
+    Checks every theorem of a library (a module or a list of theorem
+    classes, the default being theorem_set): both sides of its conclusion,
+    and every equality of its proof, must have the same values at the
+    points. Returns the list of the theorem classes that failed, with the
+    first equality that does not hold, or with the exception thrown while
+    reading the theorem or its proof.
+
+    The theorems are not verified: they are instantiated with lazy
+    verification, and only the equalities of their proof are recorded (see
+    proof.record_equalities()). A false theorem is thus reported instead of
+    stopping the check.
+    """
+    # proof uses this module, so it is only imported when needed.
+    proof = importlib.import_module("proof")
+    theorem_classes = rindex.library_classes(library)
+    was_lazy = thm.LAZY_VERIFICATION
+    thm.use_lazy_verification(True)
+    failures = []
+    try:
+        for theorem_class in theorem_classes:
+            try:
+                failure = check_theorem(theorem_class, proof)
+            except Exception as error:  # pylint: disable=broad-except
+                failure = error
+            if failure is not None:
+                failures.append((theorem_class, failure))
+    finally:
+        thm.use_lazy_verification(was_lazy)
+    return failures
+
+
+def check_theorem(theorem_class, proof):
+    """
+    Checks a theorem class for check_library(), and returns the first
+    equality that does not hold (None if they all may hold).
+    """
+    theorem = theorem_class(None)
+    definitions = theorem.simplifications
+    sides = expr.parse_equality(theorem.conclusion)
+    if not may_be_equal(sides[0], sides[1], definitions):
+        return theorem.conclusion
+
+    equality_trees = proof.record_equalities(theorem)
+    if equality_trees is None:
+        return None
+    first_equality = equality_trees[0]
+    for equality_tree in equality_trees[1:]:
+        if not may_be_equal(first_equality, equality_tree, definitions):
+            return first_equality.text + "=" + equality_tree.text
+    return None
@@ -2,10 +2,20 @@
 """
 Gives functions related to LaTeX generation.
 
+The modules used to hash, write and compile documents are only imported
+when a document is saved, so that converting expressions to LaTeX starts
+quickly.
+
+The date of a document is left out of its hash (see write_latex_file()),
+so that a document whose content did not change is not compiled again on
+another day. It is the current date, or the one given by the SOURCE_DATE_EPOCH
+environment variable (a number of seconds since 1970) for reproducible
+documents.
+
 Created on Fri Apr 16 18:43:50 2021
 @author: Joachim Favre & Alberts Reisons
 """
-from datetime import datetime
+from datetime import datetime, timezone
 import os
 
 MONTHS = ["January", "February", "March", "April", "May", "June", "July",
@@ -13,6 +23,16 @@ MONTHS = ["January", "February", "March", "April", "May", "June", "July",
 
 RESULT_DIRECTORY = "result"
 
+# Files written by pdflatex that are read by the next pass: if the first pass
+# did not change them, a second one would give the same document.
+AUXILIARY_EXTENSIONS = [".aux", ".toc"]
+
+# Extension of the file storing the hash of the last LaTeX code compiled.
+HASH_EXTENSION = ".hash"
+
+# Command giving the date of a document, which is not part of its hash.
+DATE_COMMAND = r"\date{"
+
 
 def format_day(day_number):
     """
@@ -30,9 +50,15 @@ def format_day(day_number):
 
 def get_date():
     """
-    Returns the current date, well formatted.
+    Returns the current date, well formatted. If the SOURCE_DATE_EPOCH
+    environment variable is set, its date (in UTC) is used instead.
     """
-    current_time = datetime.now()
+    source_date_epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if source_date_epoch:
+        current_time = datetime.fromtimestamp(int(source_date_epoch),
+                                              timezone.utc)
+    else:
+        current_time = datetime.now()
     result = (format_day(current_time.day) + " " + MONTHS[current_time.month-1]
               + " " + str(current_time.year))
     return result
@@ -46,10 +72,7 @@ def concatenate_lines(lines):
     a carriage return at the end of each line. This function is thus more used
     for LaTeX code generation.
     """
-    result = ""
-    for line in lines:
-        result += line + "\n"
-    return result
+    return "".join(line + "\n" for line in lines)
 
 
 def write_as_list(expression_list):
@@ -110,10 +133,13 @@ def convert_2_latex(text):
     return result
 
 
-def init_latex_code(title, author):
+def init_latex_code(title, author, date=None):
     """
-    Returns the header of a LaTeX file.
+    Returns the header of a LaTeX file. If no date is given, uses
+    get_date().
     """
+    if date is None:
+        date = get_date()
     lines = [r"\documentclass[a4paper]{article}",
              r"\usepackage[T1]{fontenc}",
              r"\usepackage[utf8]{inputenc}",
@@ -146,7 +172,7 @@ def init_latex_code(title, author):
              "",
              r"\title{" + title + "}",
              r"\author{" + author + "}",
-             r"\date{" + get_date() + "}",
+             DATE_COMMAND + date + "}",
              "",
              r"\begin{document}",
              r"\maketitle",
@@ -166,34 +192,153 @@ def end_latex_code():
     return concatenate_lines(lines)
 
 
-def write_to_file(latex_code, file_name, no_ending=False):
+def read_file_if_exists(path):
     """
-    Writes some LaTeX code to a file at ./RESULT_DIRECTORY/{file_name} and
-    compiles it. TThe no_ending parameter can be used to tell
+    Returns the content of a file, or None if it does not exist.
+    """
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def without_date(latex_code):
+    """
+    Returns some LaTeX code without the line giving its date, if it has one.
+    """
+    start = latex_code.find(DATE_COMMAND)
+    if start == -1:
+        return latex_code
+    end = latex_code.find("\n", start)
+    if end == -1:
+        return latex_code[:start]
+    return latex_code[:start] + latex_code[end + 1:]
+
+
+def write_latex_file(latex_code, file_name, no_ending=False):
+    """
+    Writes some LaTeX code to a file at ./RESULT_DIRECTORY/{file_name}.tex,
+    without compiling it. The no_ending parameter can be used to tell
     this function to add an ending to the latex_code, using end_latex_code().
+    Returns the hash of the code written, used to know whether the document
+    changed since it was last compiled. The line giving the date of the
+    document (see without_date()) is not part of it, so that the hash of a
+    document does not change every day.
+
+    latex_code is either a string or an iterable of strings (such as a
+    generator). Fragments are written to the file one by one as they come,
+    so that the whole document never needs to be held in memory.
     """
-    if no_ending:
-        latex_code += end_latex_code()
+    import hashlib  # pylint: disable=import-outside-toplevel
+
+    if isinstance(latex_code, str):
+        latex_code = [latex_code]
 
     result_path = RESULT_DIRECTORY + '/' + file_name
+    digest = hashlib.sha256()
 
     with open(result_path + '.tex', 'w', encoding='utf-8') as file:
-        file.write(latex_code)
+        for fragment in latex_code:
+            file.write(fragment)
+            digest.update(without_date(fragment).encode('utf-8'))
+        if no_ending:
+            ending = end_latex_code()
+            file.write(ending)
+            digest.update(ending.encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def run_pdflatex(file_name):
+    """
+    Runs pdflatex once on ./RESULT_DIRECTORY/{file_name}.tex, capturing its
+    output instead of writing it to the terminal. Returns whether it
+    succeeded.
+    """
+    import subprocess  # pylint: disable=import-outside-toplevel
 
-    compil_cmd = ("pdflatex -output-directory "
-                  + RESULT_DIRECTORY + " " + result_path + ".tex")
+    result_path = RESULT_DIRECTORY + '/' + file_name
+    compil_cmd = ["pdflatex", "-interaction=nonstopmode",
+                  "-output-directory", RESULT_DIRECTORY,
+                  result_path + ".tex"]
+    try:
+        completed = subprocess.run(compil_cmd, capture_output=True,
+                                   check=False)
+    except OSError:
+        return False
+    return completed.returncode == 0
+
+
+def compile_latex(file_name, latex_hash=None):
+    """
+    Compiles ./RESULT_DIRECTORY/{file_name}.tex and returns whether it
+    succeeded.
+
+    If latex_hash is the hash of the source that was last compiled
+    successfully (and the pdf still exists), nothing is done. The second
+    pdflatex pass, needed for the references and the table of contents, is
+    only run if the first one changed the .aux or .toc files.
+    """
+    result_path = RESULT_DIRECTORY + '/' + file_name
+    hash_path = result_path + HASH_EXTENSION
 
-    print("Compiling the first time...")
-    if os.system(compil_cmd) != 0:
+    if latex_hash is not None and os.path.exists(result_path + '.pdf'):
+        last_hash = read_file_if_exists(hash_path)
+        if last_hash == latex_hash.encode('utf-8'):
+            print("{} is up to date.".format(file_name))
+            return True
+
+    auxiliary_paths = [result_path + extension
+                       for extension in AUXILIARY_EXTENSIONS]
+    auxiliary_before = [read_file_if_exists(path) for path in auxiliary_paths]
+
+    print("Compiling {} the first time...".format(file_name))
+    if not run_pdflatex(file_name):
         print("There was a problem during the first LaTeX compilation. Do "
               "not hesitate to take a look to the .log file to see what "
               "wnet wrong. You may have kept the pdf document opened, for "
               "example.")
-        return
+        return False
 
-    print("Compiling the second time...")
-    if os.system(compil_cmd) != 0:
-        print("There was a problem during the second LaTeX compilation. Do "
-              "not hesitate to take a look to the .log file to see what "
-              "went wrong.")
-        return
+    auxiliary_after = [read_file_if_exists(path) for path in auxiliary_paths]
+    if auxiliary_after != auxiliary_before:
+        print("Compiling {} the second time...".format(file_name))
+        if not run_pdflatex(file_name):
+            print("There was a problem during the second LaTeX compilation. "
+                  "Do not hesitate to take a look to the .log file to see "
+                  "what went wrong.")
+            return False
+
+    if latex_hash is not None:
+        with open(hash_path, 'w', encoding='utf-8') as file:
+            file.write(latex_hash)
+    return True
+
+
+def compile_all(file_names, latex_hashes=None, jobs=None):
+    """
+    Compiles many LaTeX files of RESULT_DIRECTORY at the same time, using
+    at most jobs pdflatex processes (None to let the executor choose).
+    Returns whether each compilation succeeded, in the same order.
+    """
+    # pylint: disable-next=import-outside-toplevel
+    from concurrent.futures import ThreadPoolExecutor
+
+    if latex_hashes is None:
+        latex_hashes = [None]*len(file_names)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(compile_latex, file_names, latex_hashes))
+
+
+def write_to_file(latex_code, file_name, no_ending=False):
+    """
+    Writes some LaTeX code to a file at ./RESULT_DIRECTORY/{file_name} and
+    compiles it. TThe no_ending parameter can be used to tell
+    this function to add an ending to the latex_code, using end_latex_code().
+    The compilation is skipped if this exact code was already compiled. As in
+    write_latex_file(), latex_code may be an iterable of strings.
+    """
+    latex_hash = write_latex_file(latex_code, file_name, no_ending)
+    return compile_latex(file_name, latex_hash)
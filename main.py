@@ -15,6 +15,8 @@ import time
 import random as rng
 
 from theorem_group import TheoremGroup
+from verification_cache import VerificationCache
+import theorem as thm
 import theorem_set as thmset
 import hijacks
 
@@ -22,7 +24,13 @@ import hijacks
 beginning_time = time.time()
 rng.seed(1729)  # can be set to be always different (using beginning_time)
 
+# Theorems that did not change since the last run are not verified again.
+thm.use_verification_cache(VerificationCache("cache"))
+
 theorem_group = TheoremGroup("A set of proofs that definitely deserve a 6")
+# The sections of the theorems that did not change since the last run are
+# not generated again.
+theorem_group.load_manifest("result")
 
 # theorem_group.add_theorem(hijacks.Hijack1)
 # theorem_group.add_theorem(hijacks.Hijack2)
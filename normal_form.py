@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Gives a canonical form of expressions, equal for expressions that only
+differ by the associativity and the commutativity of + and *.
+
+The normal form of a tree is obtained by removing its parenthesis, by
+flattening the sums of sums and the products of products (a + (b + c) is
+a + b + c), and by adding parenthesis back only where they are needed. The
+operands of every sum and of every product are then sorted by the text of
+their normal form. Powers are neither associative nor commutative, so
+their operands keep their order. The normal form is thus still an
+expression tree (an interned one, see expression.py), whose text can be
+parsed again.
+
+For instance, a*b + c, c + b*a and (c + (a*b)) all have the normal form
+a*b+c. The normal form is only used to find equivalent expressions (in
+caches, the rewrite index or the proof search): proofs still state every
+use of AdditionCommutativity or ProductCommutativity explicitly.
+
+canonical_hash() gives a hash of the normal form that does not change
+between runs, unlike hash(), so that it can be stored in files.
+
+CONSTANTS
+*********
+- CACHE_SIZE: the number of normal forms kept in the cache.
+
+Created on Sat Oct 17 22:47:19 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+from functools import lru_cache
+
+import expression as expr
+import text_gestion as tg
+
+
+CACHE_SIZE = 4096
+
+# Operators whose operands can be reordered and regrouped.
+AC_OPERATORS = "+*"
+
+
+def strip_parenthesis(node):
+    """
+    Returns the content of a node without the parenthesis around it.
+    """
+    while node.kind == expr.PARENTHESIS:
+        node = node.children[0]
+    return node
+
+
+def needs_parenthesis(child, operator, position, number):
+    """
+    Returns whether the normal form of an operand needs parenthesis to be
+    the operand at the position given of an operation with this operator
+    and number operands.
+    """
+    if child.kind != expr.OPERATION:
+        return False
+    if child.value != operator:
+        return tg.OPERATION_ORDER[child.value] < tg.OPERATION_ORDER[operator]
+    # A power in a power is only the same power as its last operand
+    return operator == '^' and position != number - 1
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normal_form(tree):
+    """
+    Returns the normal form of a tree. Trees are interned, so the normal
+    form of an expression (and of each of its subexpressions) is computed
+    only once.
+    """
+    tree = strip_parenthesis(tree)
+    if tree.kind != expr.OPERATION:
+        return tree
+
+    operator = tree.value
+    operands = []
+    for child in tree.children:
+        child = normal_form(child)
+        if (operator in AC_OPERATORS and child.kind == expr.OPERATION
+                and child.value == operator):
+            operands.extend(child.children)
+        else:
+            operands.append(child)
+
+    if (operator not in AC_OPERATORS and operands[-1].kind == expr.OPERATION
+            and operands[-1].value == '^'):
+        # a^(b^c) is a^b^c, since powers are right associative
+        operands[-1:] = operands[-1].children
+
+    number = len(operands)
+    operands = [expr.make_parenthesis(child)
+                if needs_parenthesis(child, operator, position, number)
+                else child
+                for position, child in enumerate(operands)]
+    if operator in AC_OPERATORS:
+        # Operands are sorted with their parenthesis, which do not depend on
+        # their position in a sum or a product
+        operands.sort(key=lambda operand: operand.text)
+    return expr.make_operation(operator, operands)
+
+
+def canonical_text(expression):
+    """
+    Returns the text of the normal form of an expression (a text or a
+    tree).
+    """
+    if isinstance(expression, str):
+        expression = expr.parse(expression)
+    return normal_form(expression).text
+
+
+def canonical_hash(expression):
+    """
+    Returns the SHA-1 hexadecimal digest of the canonical_text() of an
+    expression (a text or a tree), which is the same in every run.
+    """
+    # Only imported here, since this module is imported by every theorem.
+    import hashlib  # pylint: disable=import-outside-toplevel
+
+    text = canonical_text(expression)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def are_equivalent(first, second):
+    """
+    Returns whether two expressions (texts or trees) have the same normal
+    form.
+    """
+    return canonical_text(first) == canonical_text(second)
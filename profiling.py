@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Gives profiling hooks, to find which theorem and which stage of it is slow.
+
+The verification and the LaTeX generation are split into stages (parsing,
+verify_maths, the search of the modification, the order of operation check,
+LaTeX conversion, pdflatex...), each of them being run as:
+    with prof.stage("parsing", theorem_class):
+        ...
+The hook used is set with use_hook(). By default, it is a NullHook, whose
+stages are all the same shared context doing nothing, so that profiling
+costs almost nothing when it is not used. A Profiler records the number of
+calls and the cumulative time of every stage of every theorem class, and
+exports them as a report or as collapsed stacks (one line per stack, as
+used by flamegraph.pl and speedscope).
+
+Only the current process is profiled: theorems verified in worker processes
+(see verification_scheduler.py) do not appear in the report.
+
+Created on Sat Oct 17 17:03:44 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+from contextlib import nullcontext
+import time
+
+
+# Name used in reports for the stages that are not run for a theorem.
+NO_THEOREM = "-"
+
+_NULL_STAGE = nullcontext()
+
+
+class NullHook:
+    """
+    Hook that does not record anything. This is the default one.
+    """
+
+    def stage(self, name, theorem_class=None):
+        """
+        Returns a context doing nothing.
+        """
+        return _NULL_STAGE
+
+
+class Profiler:
+    """
+    Hook recording the calls and the time spent in every stage.
+
+    Attributes
+    **********
+    - counts: the number of calls, by (theorem name, stage name).
+    - times: the cumulative time in seconds, by (theorem name, stage name).
+             The time of a stage includes the time of the stages it runs.
+    - stack_times: the time spent in each stack of stages, excluding the
+                   stages it runs, by tuple of frame names.
+    - stack: the frames of the stages currently running, the outermost
+             first, as [frame name, theorem name, time of the child stages].
+    """
+
+    def __init__(self):
+        """
+        Instanciates the attributes of an empty profile.
+        """
+        self.counts = {}
+        self.times = {}
+        self.stack_times = {}
+        self.stack = []
+
+    def stage(self, name, theorem_class=None):
+        """
+        Returns the context measuring a stage. Stages run without a theorem
+        class belong to the theorem of the stage running them, if any.
+        """
+        return _ProfiledStage(self, name, theorem_class)
+
+    def enter(self, name, theorem_class):
+        """
+        Starts a stage. This is called by the contexts returned by stage().
+        """
+        if theorem_class is not None:
+            theorem_name = theorem_class.__name__
+            frame_name = theorem_name + ":" + name
+        else:
+            theorem_name = self.stack[-1][1] if self.stack else NO_THEOREM
+            frame_name = name
+        self.stack.append([frame_name, theorem_name, 0.0])
+
+    def exit(self, name, elapsed):
+        """
+        Ends the innermost stage, which lasted elapsed seconds.
+        """
+        stack_key = tuple(frame[0] for frame in self.stack)
+        _, theorem_name, children_time = self.stack.pop()
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+        key = (theorem_name, name)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.times[key] = self.times.get(key, 0.0) + elapsed
+        self.stack_times[stack_key] = (self.stack_times.get(stack_key, 0.0)
+                                       + elapsed - children_time)
+
+    def report(self):
+        """
+        Returns the recorded stages as a list of dictionaries, the slowest
+        first.
+        """
+        rows = [{'theorem': theorem_name, 'stage': stage_name,
+                 'count': self.counts[(theorem_name, stage_name)],
+                 'time': total_time}
+                for (theorem_name, stage_name), total_time
+                in self.times.items()]
+        rows.sort(key=lambda row: (-row['time'], row['theorem'],
+                                   row['stage']))
+        return rows
+
+    def report_text(self):
+        """
+        Returns the report() as a text table, with times in milliseconds.
+        """
+        lines = ["{:<35} {:<25} {:>8} {:>12}".format("theorem", "stage",
+                                                     "count", "time (ms)")]
+        for row in self.report():
+            lines.append("{:<35} {:<25} {:>8} {:>12.3f}".format(
+                row['theorem'], row['stage'], row['count'],
+                1000*row['time']))
+        return "\n".join(lines)
+
+    def report_json(self):
+        """
+        Returns the report() as a JSON string.
+        """
+        # Only imported here, since every module doing verifications imports
+        # this one.
+        import json  # pylint: disable=import-outside-toplevel
+
+        return json.dumps(self.report(), indent=1)
+
+    def collapsed_stacks(self):
+        """
+        Returns the recorded stacks in the collapsed format of flamegraph.pl:
+        one line per stack, with its frames separated by semicolons and its
+        own time in microseconds.
+        """
+        lines = []
+        for stack_key, stack_time in sorted(self.stack_times.items()):
+            microseconds = round(1e6*stack_time)
+            if microseconds > 0:
+                lines.append("{} {}".format(";".join(stack_key),
+                                            microseconds))
+        return "\n".join(lines) + "\n"
+
+    def save(self, file_name, output_format="text"):
+        """
+        Writes the report to a file. output_format is "text", "json" or
+        "collapsed" (for collapsed_stacks()).
+        """
+        if output_format == "json":
+            content = self.report_json() + "\n"
+        elif output_format == "collapsed":
+            content = self.collapsed_stacks()
+        else:
+            content = self.report_text() + "\n"
+        with open(file_name, 'w', encoding='utf-8') as file:
+            file.write(content)
+
+
+class _ProfiledStage:
+    """
+    Context measuring one stage for a Profiler.
+    """
+
+    __slots__ = ('profiler', 'name', 'theorem_class', 'beginning_time')
+
+    def __init__(self, profiler, name, theorem_class):
+        self.profiler = profiler
+        self.name = name
+        self.theorem_class = theorem_class
+        self.beginning_time = None
+
+    def __enter__(self):
+        self.profiler.enter(self.name, self.theorem_class)
+        self.beginning_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        elapsed = time.perf_counter() - self.beginning_time
+        self.profiler.exit(self.name, elapsed)
+        return False
+
+
+HOOK = NullHook()
+
+
+def use_hook(hook):
+    """
+    Sets the hook receiving the stages (a NullHook, a Profiler or any object
+    having the same stage() method). Returns the previous one.
+    """
+    global HOOK
+    previous_hook = HOOK
+    HOOK = hook
+    return previous_hook
+
+
+def stage(name, theorem_class=None):
+    """
+    Returns the context of a stage for the current hook.
+    """
+    return HOOK.stage(name, theorem_class)
@@ -9,6 +9,13 @@ import random as rng
 
 import text_gestion as tg
 import latex_gestion as tex
+import expression as expr
+import identity_check as identity
+import profiling as prof
+import theorem_graph as tgraph
+import normal_form as nf
+import proof_search as search
+import rewrite_index as rindex
 import synonyms
 
 
@@ -35,6 +42,17 @@ WRONG_SIMPLIFICATION_MESSAGE = ("The simplification you want to use is not "
 
 CANNOT_CONCLUDE_MESSAGE = "This proof could not get concluded."
 
+STEP_NOT_JUSTIFIED_MESSAGE = ("No theorem of the library allows to get to "
+                              "'{}' from a previous equality by one "
+                              "modification.")
+
+PROOF_SEARCH_FAILED_MESSAGE = ("No steps going from '{}' to '{}' were found "
+                               "within the budgets of the search.")
+
+# Whether proofs only record their equalities, without verifying their steps
+# nor writing their LaTeX code. It is set by record_equalities().
+RECORD_ONLY = False
+
 
 class ModificationNotValidError(Exception):
     """
@@ -94,6 +112,30 @@ class CannotConcludeError(Exception):
         super().__init__(CANNOT_CONCLUDE_MESSAGE)
 
 
+class StepNotJustifiedError(Exception):
+    """
+    An exception that is thrown when no theorem could be found to justify
+    a step given without its theorem.
+    """
+
+    def __init__(self, new_equality):
+        message = STEP_NOT_JUSTIFIED_MESSAGE
+        message = message.format(new_equality)
+        super().__init__(message)
+
+
+class ProofSearchFailedError(Exception):
+    """
+    An exception that is thrown when the proof search could not find the
+    steps going to the target asked.
+    """
+
+    def __init__(self, start, target):
+        message = PROOF_SEARCH_FAILED_MESSAGE
+        message = message.format(start, target)
+        super().__init__(message)
+
+
 class Proof():
     """
     Proof class. This is what is used to prove the theorem we want. It only
@@ -104,60 +146,131 @@ class Proof():
     - theorem: the theorem it tries to prove.
     - conclusion_aim: the goal of this proof. It used to verify that we can
                       conclude this proof when the user asks to do it.
+    - conclusion_aim_trees: the parsed trees of both sides of conclusion_aim.
     - equalities: a list of mathematical expressions that are equal.
+    - equality_trees: the parsed trees of the equalities, in the same order.
+    - equality_index: the equalities grouped by their character
+                      fingerprint (see tg.character_fingerprint()), so
+                      that finding the equality a step started from only
+                      tests the few equalities that could match.
+    The last three attributes are only needed to verify the steps, so they
+    are None once the proof is finished (see conclude()).
     - is_finished: specifies whether this proofs was finished by calling
                    the conclude() method.
-    - dependencies: instance of theorems in the order this proof uses them.
-                    This is latter used to make reference throughout the
-                    LaTeX code, between theorems.
-    - latex_code: a string containing the LaTeX code of this proof.
+    - dependencies: references to the theorems in the order this proof
+                    uses them (see thm.TheoremReference). This is latter
+                    used to make reference throughout the LaTeX code,
+                    between theorems.
+    - latex_fragments: the pieces of the LaTeX code of this proof, in
+                       order. They are only joined when latex_code is read,
+                       so that adding a step does not copy the whole code.
     """
 
+    __slots__ = ('theorem', 'conclusion_aim', 'conclusion_aim_trees',
+                 'equalities', 'equality_trees', 'equality_index',
+                 'is_finished', 'dependencies', 'latex_fragments')
+
     def __init__(self, theorem, starting_equality):
         """
         Instanciates the attributes and starts the LaTeX code.
         """
         self.theorem = theorem
         self.conclusion_aim = tg.remove_spaces(theorem.conclusion).split('=')
+        self.conclusion_aim_trees = [expr.parse(side)
+                                     for side in self.conclusion_aim]
 
         self.equalities = []
+        self.equality_trees = []
+        self.equality_index = {}
         self.is_finished = False
-        self.dependencies = []  # theorems instance in order used
+        self.dependencies = []  # theorem references in order used
 
-        self.latex_code = ""
+        self.latex_fragments = []
         if len(theorem.unknowns) > 0:
             unknowns = [tex.convert_2_latex(unknown)
                         for unknown in theorem.unknowns]
-            self.latex_code += ("Let " + tex.write_as_list(unknowns)
-                                + " be unknown (or known). ")
+            self.latex_fragments += ["Let ", tex.write_as_list(unknowns),
+                                     " be unknown (or known). "]
 
         if len(theorem.simplifications) > 0:
             simplifications = [tex.convert_2_latex(equality[0]
                                                    + "=" + equality[1])
                                for equality in theorem.simplifications]
-            self.latex_code += ("Let "
-                                + tex.write_as_list(simplifications)
-                                + " be ")
+            self.latex_fragments += ["Let ",
+                                     tex.write_as_list(simplifications),
+                                     " be "]
             if len(theorem.simplifications) > 1:
-                self.latex_code += "simplifications (as numbers). "
+                self.latex_fragments.append("simplifications (as numbers). ")
             else:
-                self.latex_code += "a simplification (as a number). "
+                self.latex_fragments.append("a simplification "
+                                            "(as a number). ")
 
         # Manage starting_equality
         starting_equality = tg.remove_spaces(starting_equality)
         self.theorem.verify_has_instantiated_every_character(starting_equality)
 
-        self.equalities = [starting_equality]
-        self.latex_code += rng.choice(synonyms.LET_US_START_WITH) + "\n"
+        self.add_equality(starting_equality, expr.parse(starting_equality))
+        self.latex_fragments += [rng.choice(synonyms.LET_US_START_WITH), "\n"]
         line = r"\[{}\]".format(tex.convert_2_latex(starting_equality))
-        self.latex_code += line + "\n\n"
+        self.latex_fragments += [line, "\n\n"]
+
+    @property
+    def latex_code(self):
+        """
+        The LaTeX code of this proof, as one string.
+        """
+        return "".join(self.latex_fragments)
+
+    @classmethod
+    def restore(cls, theorem, equalities, dependencies, latex_code):
+        """
+        Returns a finished proof of the theorem given, built from the result
+        of a previous verification (see verification_cache.py) instead of
+        verifying every step again.
+        """
+        proof = cls.__new__(cls)
+        proof.theorem = theorem
+        proof.conclusion_aim = tg.remove_spaces(theorem.conclusion).split('=')
+        proof.conclusion_aim_trees = None
+        proof.equalities = list(equalities)
+        proof.equality_trees = None
+        proof.equality_index = None
+        proof.is_finished = True
+        proof.dependencies = list(dependencies)
+        proof.latex_fragments = [latex_code]
+        return proof
+
+    def add_equality(self, equality, equality_tree):
+        """
+        Adds a step to the equalities of this proof, and indexes it.
+        """
+        self.equalities.append(equality)
+        self.equality_trees.append(equality_tree)
+
+        fingerprint = tg.character_fingerprint(equality)
+        candidates = self.equality_index.setdefault(fingerprint, [])
+        if equality not in candidates:
+            candidates.append(equality)
+
+    def record_equality(self, new_equality, error):
+        """
+        Adds new_equality to this proof without verifying the step that
+        gives it, when only the equalities are recorded (see
+        record_equalities()). Throws the error given if it cannot be parsed.
+        """
+        try:
+            new_equality_tree = expr.parse(new_equality)
+        except expr.InvalidExpressionError:
+            raise error
+        self.add_equality(new_equality, new_equality_tree)
 
     def find_old_equality(self, new_equality, modif):
         """
         Finds the equality from which the user started to get to the new one;
         using the modification he or she gives. Returns None if none is found.
         """
-        for old_equ_candidate in self.equalities:
+        fingerprint = tg.fingerprint_before_modification(new_equality, modif)
+        for old_equ_candidate in self.equality_index.get(fingerprint, []):
             if tg.only_one_modification(old_equ_candidate, new_equality,
                                         modif):
                 return old_equ_candidate
@@ -176,10 +289,18 @@ class Proof():
 
         Finally, it has some verifications concerning the order of operations.
 
+        Before looking for the old equality, both sides of modif, and the
+        new equality and the first one, are evaluated at random points
+        (see identity_check.py): a step that cannot hold is thus rejected
+        right away.
+
         When it has all verified, it stores this step in LaTeX.
         """
         new_equality = tg.remove_spaces(new_equality)
         modif = tg.remove_spaces(modif)
+        if RECORD_ONLY:
+            self.record_equality(new_equality, WrongModificationError)
+            return
 
         if not theorem.is_proven():
             raise TheoremNotPovenError
@@ -190,13 +311,34 @@ class Proof():
         self.theorem.verify_has_instantiated_every_character(new_equality)
         self.theorem.verify_has_instantiated_every_character(modif)
 
-        old_equality = self.find_old_equality(new_equality, modif)
+        theorem_class = type(self.theorem)
+        try:
+            with prof.stage("parsing", theorem_class):
+                new_equality_tree = expr.parse(new_equality)
+        except expr.InvalidExpressionError:
+            raise WrongModificationError
+
+        definitions = self.theorem.simplifications
+        with prof.stage("identity_check", theorem_class):
+            modif_holds = identity.may_be_equal(theorem.left_hand_side_tree,
+                                                theorem.right_hand_side_tree)
+            step_holds = identity.may_be_equal(self.equality_trees[0],
+                                               new_equality_tree,
+                                               definitions)
+        if not modif_holds:
+            raise ModificationNotValidError
+        if not step_holds:
+            raise WrongModificationError
+
+        with prof.stage("matching", theorem_class):
+            old_equality = self.find_old_equality(new_equality, modif)
         if old_equality is None:
             raise WrongModificationError
 
         # equality is ok
-        self.dependencies.append(theorem)
-        self.equalities.append(new_equality)
+        tgraph.VERIFICATION_GRAPH.add_edge(type(self.theorem), type(theorem))
+        self.dependencies.append(theorem.reference())
+        self.add_equality(new_equality, new_equality_tree)
 
         entire_line = old_equality + "=" + new_equality
         if modif == entire_line:
@@ -204,13 +346,14 @@ class Proof():
         else:
             line = rng.choice(synonyms.BY_HAVE_THAT_THEREFORE)
 
-        line = line.format(theorem.name,
-                           "{" + "}",
-                           tex.convert_2_latex(modif))
-        self.latex_code += line + "\n"
+        with prof.stage("latex", theorem_class):
+            line = line.format(theorem.name,
+                               "{" + "}",
+                               tex.convert_2_latex(modif))
+            self.latex_fragments += [line, "\n"]
 
-        line = r"\[{}\]".format(tex.convert_2_latex(entire_line))
-        self.latex_code += line + "\n\n"
+            line = r"\[{}\]".format(tex.convert_2_latex(entire_line))
+            self.latex_fragments += [line, "\n\n"]
 
     def use_simplification(self, new_equality, simplification):
         """
@@ -219,6 +362,9 @@ class Proof():
         """
         simplification = tg.remove_spaces(simplification)
         new_equality = tg.remove_spaces(new_equality)
+        if RECORD_ONLY:
+            self.record_equality(new_equality, WrongSimplificationError)
+            return
 
         splitted_simplification = simplification.split('=')
         if len(splitted_simplification) != 2:
@@ -235,18 +381,105 @@ class Proof():
         if not valid:
             raise WrongSimplificationError
 
-        old_equality = self.find_old_equality(new_equality, simplification)
+        theorem_class = type(self.theorem)
+        with prof.stage("matching", theorem_class):
+            old_equality = self.find_old_equality(new_equality,
+                                                  simplification)
         if old_equality is None:
             raise WrongSimplificationError
 
+        try:
+            with prof.stage("parsing", theorem_class):
+                new_equality_tree = expr.parse(new_equality)
+        except expr.InvalidExpressionError:
+            raise WrongSimplificationError
+
         # equality is ok
-        self.equalities.append(new_equality)
+        self.add_equality(new_equality, new_equality_tree)
 
         entire_line = old_equality + "=" + new_equality
-        simplification = tex.convert_2_latex(simplification)
-        self.latex_code += "We have let ${}$, so\n".format(simplification)
-        self.latex_code += r"\[{}\]".format(tex.convert_2_latex(entire_line))
-        self.latex_code += "\n\n"
+        with prof.stage("latex", theorem_class):
+            simplification = tex.convert_2_latex(simplification)
+            line = r"\[{}\]".format(tex.convert_2_latex(entire_line))
+            self.latex_fragments += ["We have let ${}$, so\n".format(
+                                         simplification),
+                                     line, "\n\n"]
+
+    def auto_step(self, new_equality, library=None):
+        """
+        Makes the equality evolve like evolve_equality(), finding the
+        modification and the theorem by itself. The modification is the
+        part of a previous equality (the last one first) that differs from
+        new_equality, or a bigger part containing it, and the theorem is
+        found in the index of library (a module or a list of theorem
+        classes, the default being theorem_set). The instances of the
+        theorems are reused between steps (see rindex.instantiate()).
+
+        If no theorem gives new_equality directly, but it is a previous
+        equality written in another order (they have the same normal form,
+        see normal_form.py), the commutativity and associativity steps
+        going to it are searched (see search_to()) and added one by one.
+
+        Returns the list of the theorems used. Throws a
+        StepNotJustifiedError if no theorem could be found.
+        """
+        new_equality = tg.remove_spaces(new_equality)
+        self.theorem.verify_has_instantiated_every_character(new_equality)
+        try:
+            new_equality_tree = expr.parse(new_equality)
+        except expr.InvalidExpressionError:
+            raise StepNotJustifiedError(new_equality)
+
+        index = rindex.get_index(library, type(self.theorem))
+        for old_equality_tree in reversed(self.equality_trees):
+            differences = expr.differences(old_equality_tree,
+                                           new_equality_tree)
+            for old_part, new_part in differences:
+                for theorem in index.justifications(old_part, new_part):
+                    modif = old_part.text + "=" + new_part.text
+                    try:
+                        self.evolve_equality(new_equality, modif, theorem)
+                    except WrongModificationError:
+                        continue
+                    return [theorem]
+
+        normal_form = nf.normal_form(new_equality_tree)
+        for old_equality_tree in reversed(self.equality_trees):
+            if nf.normal_form(old_equality_tree) is not normal_form:
+                continue
+            steps = search.search_steps(old_equality_tree.text, new_equality,
+                                        library, type(self.theorem))
+            if steps is not None:
+                for step in steps:
+                    self.evolve_equality(step.new_expression,
+                                         step.modification, step.theorem)
+                return [step.theorem for step in steps]
+
+        raise StepNotJustifiedError(new_equality)
+
+    def search_to(self, target, library=None, max_depth=search.MAX_DEPTH,
+                  max_nodes=search.MAX_NODES, time_limit=search.TIME_LIMIT):
+        """
+        Searches the steps going from the last equality to the target, using
+        the theorems of library (a module or a list of theorem classes, the
+        default being theorem_set), and adds them to this proof with
+        evolve_equality(). They are thus verified and written in LaTeX as if
+        they were given by hand. Theorems whose proof uses the one proven
+        here are not used.
+
+        Throws a ProofSearchFailedError if no steps were found within the
+        budgets (see proof_search.py).
+        """
+        start = self.equalities[-1]
+        steps = search.search_steps(start, target, library,
+                                    type(self.theorem), max_depth, max_nodes,
+                                    time_limit)
+        if steps is None:
+            raise ProofSearchFailedError(start, tg.remove_spaces(target))
+
+        for step in steps:
+            self.evolve_equality(step.new_expression, step.modification,
+                                 step.theorem)
 
     def conclude(self):
         """
@@ -254,22 +487,49 @@ class Proof():
         some line of LaTeX for its conclusion. Throws an exception if it
         cannot conclude.
         """
-        if self.is_finished:
+        if self.is_finished or RECORD_ONLY:
             return
 
-        conclusion_lhs, conclusion_rhs = self.conclusion_aim
-        if (conclusion_lhs not in self.equalities
-                or conclusion_rhs not in self.equalities):
+        conclusion_lhs, conclusion_rhs = self.conclusion_aim_trees
+        if (conclusion_lhs not in self.equality_trees
+                or conclusion_rhs not in self.equality_trees):
             raise CannotConcludeError
 
         self.is_finished = True
+        # Only needed to verify the steps, so they are not kept.
+        self.conclusion_aim_trees = None
+        self.equality_trees = None
+        self.equality_index = None
 
-        self.latex_code += rng.choice(synonyms.CONCLUSION) + "\n"
+        self.latex_fragments += [rng.choice(synonyms.CONCLUSION), "\n"]
         left_hand_side = tex.convert_2_latex(self.conclusion_aim[0])
         right_hand_side = tex.convert_2_latex(self.conclusion_aim[1])
-        self.latex_code += r"\[{} = {}\]".format(left_hand_side,
-                                                 right_hand_side)
-        self.latex_code += "\n"
-        self.latex_code += tex.concatenate_lines([r"\begin{flushright}",
-                                                 "QED",
-                                                  r"\end{flushright}"])
+        self.latex_fragments += [r"\[{} = {}\]".format(left_hand_side,
+                                                       right_hand_side),
+                                 "\n"]
+        self.latex_fragments.append(tex.concatenate_lines(
+            [r"\begin{flushright}", "QED", r"\end{flushright}"]))
+
+
+def record_equalities(theorem):
+    """
+    Returns the trees of the equalities of the proof of a theorem, in the
+    order its get_proof() method writes them, without verifying its steps,
+    or None if the theorem is an axiom. The theorems used in the steps are
+    thus not verified either if lazy verification is used (see
+    thm.use_lazy_verification()). The random generator is left as it was,
+    so that this does not change the LaTeX code of the documents.
+    """
+    global RECORD_ONLY
+    previous_record_only = RECORD_ONLY
+    state = rng.getstate()
+    RECORD_ONLY = True
+    try:
+        proof = theorem.get_proof()
+    finally:
+        RECORD_ONLY = previous_record_only
+        rng.setstate(state)
+
+    if proof is None:
+        return None
+    return proof.equality_trees
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Gives a search of the steps going from an expression to another one.
+
+The conclusions of the theorems of a library are used as rewrite rules, in
+both directions: the unknowns of a side are wildcards that can match any
+subexpression, and the other side, instantiated with the same parameters,
+replaces it. Subexpressions are the nodes of the parsed expression, and the
+consecutive operands of a sum or a product (in a + b + c, both a + b and
+b + c can be rewritten).
+
+The search is best-first: the expression expanded next is the one minimizing
+its depth plus its distance to the target, measured on the number of times
+each character appears in both. Between expressions that are as close,
+the ones equivalent to the target up to the order of the operands of sums
+and products (see normal_form.py) come first, since only commutativity and
+associativity steps are left to find for them. An expression that was
+already reached is never explored again; since expression trees are
+interned, this is a set of nodes. The search stops after max_nodes
+expressions were reached or after time_limit seconds, so that it can be run
+on many conjectures.
+
+The rules matching an expression are found with a rewrite_index.RewriteIndex,
+which can be built once for a library and given to every search.
+
+Every step found is checked as Proof.evolve_equality() would check it, so
+that giving the steps to it gives a verified proof and its LaTeX code (see
+Proof.search_to()).
+
+CONSTANTS
+*********
+- MAX_DEPTH: the default greatest number of steps of a proof.
+- MAX_NODES: the default greatest number of expressions reached.
+- TIME_LIMIT: the default greatest duration of a search, in seconds.
+
+Created on Sat Oct 17 20:41:12 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+from collections import Counter
+import heapq
+import itertools
+import time
+
+import expression as expr
+import normal_form as nf
+import rewrite_index as rindex
+import text_gestion as tg
+
+
+MAX_DEPTH = 12
+
+MAX_NODES = 20000
+
+TIME_LIMIT = 10.0
+
+
+class SearchStep:
+    """
+    One step of a proof found by the search, to be given to
+    Proof.evolve_equality().
+
+    Attributes
+    **********
+    - new_expression: the expression obtained after this step.
+    - modification: the modification done, as "old part=new part".
+    - theorem: the theorem instance justifying the modification.
+    """
+
+    def __init__(self, new_expression, modification, theorem):
+        """
+        Instanciates the attributes.
+        """
+        self.new_expression = new_expression
+        self.modification = modification
+        self.theorem = theorem
+
+    def __repr__(self):
+        return "SearchStep({!r}, {!r}, {})".format(
+            self.new_expression, self.modification,
+            type(self.theorem).__name__)
+
+
+def subexpressions(tree):
+    """
+    Generates the subexpressions of a tree that can be rewritten, as
+    (node, start, end, operator): the node, its position in the text of the
+    tree, and the operator of the operation directly containing it (None if
+    there is none, and expr.POWER_EXPONENT for the exponent of a power, see
+    expr.symbol_contexts()).
+    """
+    to_visit = [(tree, 0, None)]
+    while to_visit:
+        node, start, operator = to_visit.pop()
+        yield node, start, start + len(node.text), operator
+
+        if node.kind == expr.PARENTHESIS:
+            to_visit.append((node.children[0], start + 1, None))
+        elif node.kind == expr.OPERATION:
+            starts = [start]
+            for child in node.children:
+                starts.append(starts[-1] + len(child.text) + 1)
+            number = len(node.children)
+            for index, child in enumerate(node.children):
+                to_visit.append((child, starts[index], node.value))
+            if node.value == '^':
+                to_visit[-1] = (node.children[-1], starts[-2],
+                                expr.POWER_EXPONENT)
+
+            # Consecutive operands. Powers are right associative, so only
+            # their last operands form a subexpression.
+            for first in range(number - 1):
+                for last in range(first + 2, number + 1):
+                    if (last - first == number
+                            or (node.value == '^' and last != number)):
+                        continue
+                    group = expr.make_operation(node.value,
+                                                node.children[first:last])
+                    operator = node.value
+                    if operator == '^':
+                        operator = expr.POWER_EXPONENT
+                    to_visit.append((group, starts[first], operator))
+                    yield group, starts[first], starts[last] - 1, operator
+
+
+class ProofSearch:
+    """
+    Best-first search of the steps going from an expression to a target.
+
+    Attributes
+    **********
+    - index: the RewriteIndex of the rules that can be used.
+    - skipped: the theorem classes whose rules must not be used.
+    """
+
+    def __init__(self, index, skipped=()):
+        """
+        Instanciates the attributes.
+        """
+        self.index = index
+        self.skipped = skipped
+
+    def successors(self, tree):
+        """
+        Generates the steps that can be done from an expression tree, as
+        (new tree, SearchStep).
+        """
+        text = tree.text
+        for node, start, end, operator in subexpressions(tree):
+            for rule, params in self.index.matches(node, self.skipped):
+                step = self.make_step(rule, params, text, start, end,
+                                      operator)
+                if step is not None:
+                    yield step
+
+    def make_step(self, rule, params, text, start, end, operator):
+        """
+        Returns the step rewriting text[start:end] using a rule and the
+        parameters of its theorem, as (new tree, SearchStep), or None if
+        this step would not be accepted by Proof.evolve_equality().
+        """
+        theorem = rindex.instantiate(rule.theorem_class, params)
+        if theorem is None:
+            return None
+
+        old_part, new_tree = rule.instance_sides(theorem)
+        # The simplifications are computed by the theorem
+        if old_part != text[start:end]:
+            return None
+        if not expr.can_replace(new_tree, operator):
+            return None
+
+        new_text = text[:start] + new_tree.text + text[end:]
+        modification = old_part + "=" + new_tree.text
+        if not tg.only_one_modification(text, new_text, modification):
+            return None
+        try:
+            new_expression = expr.parse(new_text)
+        except expr.InvalidExpressionError:
+            return None
+        return new_expression, SearchStep(new_text, modification, theorem)
+
+    def search(self, start, target, max_depth=MAX_DEPTH, max_nodes=MAX_NODES,
+               time_limit=TIME_LIMIT):
+        """
+        Returns the list of SearchStep going from the start expression to
+        the target one, or None if none was found within the budgets.
+        """
+        start_tree = expr.parse(start)
+        target_tree = expr.parse(target)
+        target_characters = Counter(target_tree.text)
+        target_normal_form = nf.normal_form(target_tree)
+        end_time = time.perf_counter() + time_limit
+
+        def distance(tree):
+            characters = Counter(tree.text)
+            characters.subtract(target_characters)
+            return sum(abs(count) for count in characters.values())
+
+        def priority(tree, depth):
+            is_equivalent = nf.normal_form(tree) is target_normal_form
+            return (depth + distance(tree), not is_equivalent, next(counter),
+                    depth, tree)
+
+        # Each reached tree is stored with its parent and the step to it.
+        parents = {start_tree: (None, None)}
+        counter = itertools.count()
+        to_expand = [priority(start_tree, 0)]
+
+        while to_expand:
+            _, _, _, depth, tree = heapq.heappop(to_expand)
+            if tree is target_tree:
+                return self.path_to(tree, parents)
+            if depth >= max_depth or time.perf_counter() > end_time:
+                continue
+
+            for new_tree, step in self.successors(tree):
+                if new_tree in parents:
+                    continue
+                parents[new_tree] = (tree, step)
+                if new_tree is target_tree:
+                    return self.path_to(new_tree, parents)
+                if len(parents) >= max_nodes:
+                    return None
+                heapq.heappush(to_expand, priority(new_tree, depth + 1))
+        return None
+
+    @staticmethod
+    def path_to(tree, parents):
+        """
+        Returns the steps going from the start of the search to a tree.
+        """
+        steps = []
+        parent, step = parents[tree]
+        while parent is not None:
+            steps.append(step)
+            parent, step = parents[parent]
+        steps.reverse()
+        return steps
+
+
+def search_steps(start, target, library=None, excluded=None,
+                 max_depth=MAX_DEPTH, max_nodes=MAX_NODES,
+                 time_limit=TIME_LIMIT, index=None):
+    """
+    Returns the list of SearchStep going from the start expression to the
+    target one using the theorems of a library (see
+    rindex.library_classes()), or None if none was found. The excluded
+    theorem class, and the ones depending on it, are not used. If the index
+    of the library is given, it is used instead of rindex.get_index().
+    """
+    if index is None:
+        index = rindex.get_index(library, excluded)
+        skipped = ()
+    else:
+        skipped = rindex.dependent_classes(
+            [rule.theorem_class for rule in index.rules], excluded)
+    search = ProofSearch(index, skipped)
+    return search.search(tg.remove_spaces(start), tg.remove_spaces(target),
+                         max_depth, max_nodes, time_limit)
+
+
+def search_conjectures(conjectures, library=None, max_depth=MAX_DEPTH,
+                       max_nodes=MAX_NODES, time_limit=TIME_LIMIT,
+                       index=None):
+    """
+    Searches the steps proving each conjecture (an equality such as
+    "(a+b)*c = c*a + c*b"), from its left hand side to its right hand side.
+    The budgets apply to each conjecture. Returns a list giving, for each
+    conjecture, its list of SearchStep or None if none was found. The index
+    of the library and the theorem instances are shared between
+    conjectures.
+    """
+    if index is None:
+        index = rindex.get_index(library)
+    search = ProofSearch(index)
+    results = []
+    for conjecture in conjectures:
+        sides = tg.remove_spaces(conjecture).split('=')
+        if len(sides) != 2:
+            results.append(None)
+            continue
+        try:
+            results.append(search.search(sides[0], sides[1], max_depth,
+                                         max_nodes, time_limit))
+        except expr.InvalidExpressionError:
+            results.append(None)
+    return results
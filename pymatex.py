@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+The command line interface of this project.
+
+Unlike main.py, which saves a fixed list of theorems, this verifies or
+saves the theorems of the modules given on the command line, so that it can
+be run on many theorem modules (in a continuous integration, for instance):
+    python -m pymatex verify theorem_set hijacks.py
+    python -m pymatex build theorem_set --output-dir result -o main --no-pdf
+    python -m pymatex bench --repeat 3
+
+A module is given by its name (it is then imported as usual) or by the path
+of its file. Only the theorems of some classes can be selected by writing
+them after the module, such as theorem_set:Addition,Product. The theorems
+are verified in parallel, using every core unless --jobs is given.
+
+The command prints a JSON report (or writes it in the file given by
+--report); the output of pdflatex is written to the standard error instead.
+It exits with EXIT_FAILURE when a module cannot be imported, when a theorem
+cannot be verified or when a document cannot be compiled, and then lists
+every failure in the report, so that all the broken theorems are found in
+one run.
+
+CONSTANTS
+*********
+- DEFAULT_SEED: the default seed of the random generator, so that the same
+                document is generated by every run.
+- EXIT_SUCCESS, EXIT_FAILURE: the exit codes of the command.
+- CLASS_SEPARATOR: the character separating a module from the theorem
+                   classes selected in it.
+
+Created on Sun Oct 18 00:41:26 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import random as rng
+import sys
+import time
+
+import latex_gestion as tex
+import theorem as thm
+import theorem_group as tgroup
+import verification_scheduler as vs
+
+
+DEFAULT_SEED = 1729
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+
+CLASS_SEPARATOR = ":"
+
+NOT_A_THEOREM_MESSAGE = "The module {} does not have a theorem class {}."
+
+
+class NotATheoremError(Exception):
+    """
+    An exception that is thrown when a theorem class selected on the command
+    line does not exist in its module.
+    """
+
+    def __init__(self, module_name, class_name):
+        message = NOT_A_THEOREM_MESSAGE
+        message = message.format(module_name, class_name)
+        super().__init__(message)
+
+
+def import_module(name):
+    """
+    Imports a module from its name or from the path of its file. The
+    directory of a file is added to sys.path, so that it can import the
+    modules next to it, and so that the worker processes can find it.
+    """
+    if name.endswith(".py") or os.sep in name:
+        directory, file_name = os.path.split(os.path.abspath(name))
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+        name = os.path.splitext(file_name)[0]
+    return importlib.import_module(name)
+
+
+def load_theorems(specification):
+    """
+    Returns the module and the theorem classes of a module specification,
+    such as "theorem_set", "hijacks.py" or "theorem_set:Addition,Product".
+    """
+    name, _, class_names = specification.partition(CLASS_SEPARATOR)
+    module = import_module(name)
+    if not class_names:
+        return module, thm.module_theorem_classes(module)
+
+    theorem_classes = []
+    for class_name in class_names.split(","):
+        theorem_class = getattr(module, class_name.strip(), None)
+        if (not isinstance(theorem_class, type)
+                or not issubclass(theorem_class, thm.Theorem)):
+            raise NotATheoremError(module.__name__, class_name)
+        theorem_classes.append(theorem_class)
+    return module, theorem_classes
+
+
+def failure(specification, error, theorem_class=None):
+    """
+    Returns the record of a failure, as it is written in the report.
+    """
+    return {"module": specification,
+            "theorem": (None if theorem_class is None
+                        else theorem_class.__qualname__),
+            "error": type(error).__name__,
+            "message": str(error)}
+
+
+def verify_all(theorem_classes, jobs, seed):
+    """
+    Verifies theorem classes (and their dependencies) and returns the list
+    of (theorem class, exception) of the ones that could not be verified.
+
+    They are first verified in parallel. Since this stops at the first
+    failure, the theorems are then verified one at a time when one of them
+    fails, so that every failure is found; the theorems verified before it
+    are not verified again.
+    """
+    try:
+        vs.verify_theorems(theorem_classes, jobs, seed)
+        return []
+    except Exception:  # pylint: disable=broad-except
+        # The exception of a worker may not even be unpicklable, so the
+        # failing theorems are found again in this process.
+        pass
+
+    errors = []
+    for theorem_class in theorem_classes:
+        try:
+            vs.verify_theorems([theorem_class], 1, seed)
+        except Exception as error:  # pylint: disable=broad-except
+            errors.append((theorem_class, error))
+    return errors
+
+
+def load_all(specifications):
+    """
+    Loads every module specification, and returns the list of
+    (specification, module, theorem classes) of the ones that could be
+    loaded, and the failures of the other ones.
+    """
+    loaded = []
+    failures = []
+    for specification in specifications:
+        try:
+            module, theorem_classes = load_theorems(specification)
+        except Exception as error:  # pylint: disable=broad-except
+            failures.append(failure(specification, error))
+            continue
+        loaded.append((specification, module, theorem_classes))
+    return loaded, failures
+
+
+def verify_loaded(loaded, arguments):
+    """
+    Verifies the theorems of loaded modules (see load_all()), and returns
+    the number of theorems and the failures. The specifications of the
+    modules having a failure are returned too.
+    """
+    theorem_classes = [theorem_class for _, _, module_classes in loaded
+                       for theorem_class in module_classes]
+    errors = dict(verify_all(theorem_classes, arguments.jobs, arguments.seed))
+
+    failures = []
+    failed = set()
+    for specification, _, module_classes in loaded:
+        for theorem_class in module_classes:
+            if theorem_class in errors:
+                failures.append(failure(specification, errors[theorem_class],
+                                        theorem_class))
+                failed.add(specification)
+    return len(theorem_classes), failures, failed
+
+
+def verify_command(arguments):
+    """
+    Verifies the theorems of the modules given, and returns the report.
+    """
+    loaded, failures = load_all(arguments.modules)
+    number, verify_failures, _ = verify_loaded(loaded, arguments)
+    return {"theorems": number, "failures": failures + verify_failures}
+
+
+def build_command(arguments):
+    """
+    Saves one document per module given (with all the dependencies of its
+    theorems), and returns the report. The documents of the modules having
+    a theorem that cannot be verified are not saved.
+    """
+    if arguments.output and len(arguments.output) != len(arguments.modules):
+        raise SystemExit("pymatex build: error: {} output paths given for {} "
+                         "modules".format(len(arguments.output),
+                                          len(arguments.modules)))
+    outputs = arguments.output or [None]*len(arguments.modules)
+    output_of = dict(zip(arguments.modules, outputs))
+
+    loaded, failures = load_all(arguments.modules)
+    number, verify_failures, failed = verify_loaded(loaded, arguments)
+    failures += verify_failures
+
+    # Each group draws the seed of its sections from the random generator.
+    rng.seed(arguments.seed)
+    tex.RESULT_DIRECTORY = arguments.output_dir
+    os.makedirs(arguments.output_dir, exist_ok=True)
+    theorem_groups = []
+    file_names = []
+    for specification, module, theorem_classes in loaded:
+        if specification in failed:
+            continue
+        title = arguments.title
+        if title is None:
+            title = module.__name__.replace('_', ' ')
+        theorem_group = tgroup.TheoremGroup(title)
+        file_name = output_of[specification] or module.__name__
+        # The sections that did not change since the last build are reused.
+        theorem_group.load_manifest(file_name)
+        try:
+            for theorem_class in theorem_classes:
+                theorem_group.add_theorem(theorem_class)
+        except Exception as error:  # pylint: disable=broad-except
+            failures.append(failure(specification, error))
+            continue
+        theorem_groups.append(theorem_group)
+        file_names.append(file_name)
+
+    compiled = tgroup.save_all(theorem_groups, file_names, arguments.jobs,
+                               not arguments.no_pdf)
+    documents = []
+    for theorem_group, file_name, success in zip(theorem_groups, file_names,
+                                                 compiled):
+        file_name = theorem_group.get_file_name(file_name)
+        documents.append(os.path.join(arguments.output_dir,
+                                      file_name + ".tex"))
+        if not success:
+            failures.append({"module": file_name, "theorem": None,
+                             "error": "LaTeXCompilationError",
+                             "message": "pdflatex could not compile "
+                                        + file_name + ".tex"})
+    return {"theorems": number, "documents": documents,
+            "failures": failures}
+
+
+def bench_command(benchmark_arguments):
+    """
+    Runs the benchmarks (see benchmark.py) with the arguments given. They
+    print their own results, so there is no report.
+    """
+    # Imported here, since the benchmarks are not needed by other commands.
+    import benchmark  # pylint: disable=import-outside-toplevel
+    benchmark.main(benchmark_arguments)
+
+
+def make_parser():
+    """
+    Returns the parser of the command line arguments.
+    """
+    parser = argparse.ArgumentParser(prog="pymatex",
+                                     description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument("modules", nargs="+", metavar="MODULE",
+                         help="theorem module name or file, optionally "
+                              "followed by :Class1,Class2 to select some "
+                              "of its theorems")
+    options.add_argument("-j", "--jobs", type=int, default=None,
+                         help="number of processes (every core by default)")
+    options.add_argument("--cache-dir", metavar="DIRECTORY",
+                         help="directory of the verification cache, so that "
+                              "unchanged theorems are not verified again")
+    options.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                         help="seed of the random generator")
+    options.add_argument("--report", metavar="FILE",
+                         help="file in which the JSON report is written "
+                              "(printed by default)")
+
+    commands.add_parser("verify", parents=[options],
+                        help="verify the theorems of modules")
+    build = commands.add_parser("build", parents=[options],
+                                help="save one document per module")
+    build.add_argument("-o", "--output", nargs="+", metavar="NAME",
+                       help="file name of the document of each module, "
+                            "without extension (the module name by default)")
+    build.add_argument("--output-dir", metavar="DIRECTORY",
+                       default=tex.RESULT_DIRECTORY,
+                       help="directory in which the documents are saved")
+    build.add_argument("--title", help="title of the documents")
+    build.add_argument("--no-pdf", action="store_true",
+                       help="only write the .tex files")
+
+    commands.add_parser("bench", help="run the benchmarks (the other "
+                                      "arguments are given to benchmark.py)")
+    return parser
+
+
+COMMANDS = {"verify": verify_command,
+            "build": build_command}
+
+
+def main(arguments=None):
+    """
+    Runs a command, writes its report and returns the exit code.
+    """
+    beginning_time = time.perf_counter()
+    parser = make_parser()
+    arguments, remaining = parser.parse_known_args(arguments)
+    if arguments.command == "bench":
+        bench_command(remaining)
+        return EXIT_SUCCESS
+    if remaining:
+        parser.error("unrecognized arguments: " + " ".join(remaining))
+
+    rng.seed(arguments.seed)
+    if arguments.cache_dir is not None:
+        # Only imported when needed, since it takes long to import.
+        import verification_cache  # pylint: disable=import-outside-toplevel
+        thm.use_verification_cache(
+            verification_cache.VerificationCache(arguments.cache_dir))
+
+    # Only the report is written to the standard output.
+    with contextlib.redirect_stdout(sys.stderr):
+        report = COMMANDS[arguments.command](arguments)
+    report["command"] = arguments.command
+    report["success"] = not report["failures"]
+    report["duration"] = round(time.perf_counter() - beginning_time, 3)
+
+    if arguments.report is None:
+        print(json.dumps(report, indent=1))
+    else:
+        with open(arguments.report, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=1)
+
+    if report["success"]:
+        return EXIT_SUCCESS
+    return EXIT_FAILURE
+
+
+if __name__ == "__main__":
+    sys.exit(main())
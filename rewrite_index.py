@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""
+Gives an index of the theorems of a library, finding which of them can
+rewrite an expression.
+
+The conclusion of every proven theorem gives two rewrite rules: its left hand
+side can be rewritten into its right hand side, and conversely. The patterns
+of the rules (the sides, whose unknowns are wildcards) are stored in a
+discrimination tree: a trie on the keys of their nodes in prefix order, a
+wildcard being one key whatever it matches. To find the rules matching an
+expression, its nodes are read in prefix order while going down the trie,
+and a whole subexpression is skipped when the wildcard edge is followed.
+Thus, only the rules whose pattern begins like the expression are tried, and
+the time taken depends on the size of the match instead of on the number of
+theorems of the library.
+
+A wildcard directly in a sum or a product can match many consecutive
+operands (in a + b, a can be x + y when matching x + y + z), so the number
+of operands of such an operation is not part of its key, and its operands
+are only compared when the bindings are computed with match().
+
+Theorem instances are built with instantiate(), which keeps the last ones
+built: using a theorem with the same parameters again (such as
+ProductCommutativity with a and b) does not verify and substitute anything.
+
+An index is built once per library, and can be saved with pickle. Trees are
+pickled as their text, and parsed again when loaded, so that they are still
+interned.
+
+Created on Sat Oct 17 21:32:07 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+from functools import lru_cache
+import importlib
+import inspect
+import pickle
+
+import expression as expr
+import text_gestion as tg
+import theorem as thm
+import theorem_graph as tgraph
+
+
+# Key of the wildcards in the discrimination tree.
+WILDCARD = "*"
+
+# Key telling that an operation has any number of operands.
+ANY_NUMBER = "any"
+
+# Key under which the rules ending at a node of the trie are stored.
+RULES = "rules"
+
+INSTANCE_CACHE_SIZE = 4096
+
+# Errors telling that a theorem cannot be instantiated with some parameters.
+INSTANTIATION_ERRORS = (thm.BadOperationOrderInReplacementError,
+                        thm.EqualitySideNotOkForMathsError,
+                        thm.NotANumberError,
+                        thm.SimplificationTooBigError)
+
+
+class RewriteRule:
+    """
+    A side of the conclusion of a theorem class, which can be rewritten
+    into the other side.
+
+    Attributes
+    **********
+    - theorem_class: the theorem class giving this rule.
+    - unknowns: the unknowns of the theorem, in the order of its param_list.
+    - wildcards: the symbols of the pattern that can match anything: the
+                 unknowns and the simplifications.
+    - pattern: the parsed side that is rewritten.
+    - left_to_right: whether the pattern is the left hand side of the
+                     conclusion.
+    """
+
+    def __init__(self, theorem_class, theorem, pattern, left_to_right):
+        """
+        Instanciates the attributes, using a theorem instance of the class.
+        """
+        self.theorem_class = theorem_class
+        self.unknowns = list(theorem.unknowns)
+        self.wildcards = set(theorem.unknowns)
+        self.wildcards.update(name for name, _ in theorem.simplifications)
+        self.pattern = pattern
+        self.left_to_right = left_to_right
+
+    def __repr__(self):
+        return "RewriteRule({}, {!r})".format(self.theorem_class.__name__,
+                                              self.pattern.text)
+
+    def instance_sides(self, theorem):
+        """
+        Returns the side of an instance of the theorem class matched by this
+        rule (as a text) and the tree of the side it is rewritten into.
+        """
+        if self.left_to_right:
+            return theorem.left_hand_side, theorem.right_hand_side_tree
+        return theorem.right_hand_side, theorem.left_hand_side_tree
+
+
+@lru_cache(maxsize=INSTANCE_CACHE_SIZE)
+def instantiate(theorem_class, params):
+    """
+    Returns the theorem class instantiated with a tuple of parameters, or
+    None if they cannot be used with this theorem. Instances are cached, so
+    they must not be modified.
+    """
+    try:
+        return theorem_class(list(params))
+    except INSTANTIATION_ERRORS:
+        return None
+
+
+def library_classes(library):
+    """
+    Returns the theorem classes of a library, which is either a module or a
+    list of theorem classes. None stands for theorem_set.
+    """
+    if library is None:
+        # theorem_set uses Proof, so it is only imported when needed.
+        library = importlib.import_module("theorem_set")
+    if inspect.ismodule(library):
+        return thm.module_theorem_classes(library)
+    return list(library)
+
+
+def library_hash(theorem_classes):
+    """
+    Returns a hash of the source code of theorem classes, which changes when
+    one of them (or the verification) changes.
+    """
+    # verification_cache imports proof, which uses this module.
+    vcache = importlib.import_module("verification_cache")
+    strings = [vcache.core_hash()]
+    for theorem_class in theorem_classes:
+        strings.append(vcache.qualified_name(theorem_class))
+        strings.append(vcache.get_source(theorem_class) or "")
+    return vcache.hash_strings(strings)
+
+
+def dependent_classes(theorem_classes, excluded):
+    """
+    Returns the set of the theorem classes of a list whose proof uses the
+    excluded theorem class (directly or not), including itself. They cannot
+    be used to prove it.
+    """
+    if excluded is None:
+        return set()
+    graph = tgraph.TheoremGraph()
+    result = {excluded}
+    for theorem_class in theorem_classes:
+        graph.add_static_dependencies(theorem_class)
+        if excluded in graph.topological_order(theorem_class):
+            result.add(theorem_class)
+    return result
+
+
+def build_rules(theorem_classes, excluded=None):
+    """
+    Returns the RewriteRule of the proven theorems of a list. Theorems
+    depending on the excluded theorem class (the one being proven) are not
+    used, since it cannot be used in its own proof.
+    """
+    skipped = dependent_classes(theorem_classes, excluded)
+    rules = []
+    for theorem_class in theorem_classes:
+        if theorem_class in skipped:
+            continue
+        try:
+            theorem = theorem_class(None)
+        except thm.TheoremRecursionError:
+            continue
+        if not theorem.is_proven():
+            continue
+
+        sides = tg.remove_spaces(theorem.conclusion).split('=')
+        patterns = [expr.parse(side) for side in sides]
+        for index, pattern in enumerate(patterns):
+            rule = RewriteRule(theorem_class, theorem, pattern, index == 0)
+            # Every unknown must be bound by the pattern.
+            if set(rule.unknowns) <= set(expr.symbol_contexts(pattern)):
+                rules.append(rule)
+    return rules
+
+
+def match(pattern, node, wildcards, bindings):
+    """
+    Generates the bindings (dictionaries from wildcard name to node) with
+    which the pattern gives the node. A wildcard in a sum or a product can
+    match many consecutive operands.
+    """
+    if pattern.kind == expr.SYMBOL and pattern.value in wildcards:
+        bound = bindings.get(pattern.value)
+        if bound is None:
+            yield {**bindings, pattern.value: node}
+        elif bound is node:
+            yield bindings
+        return
+
+    if pattern.kind != node.kind or pattern.value != node.value:
+        return
+    if pattern.kind == expr.PARENTHESIS:
+        yield from match(pattern.children[0], node.children[0], wildcards,
+                         bindings)
+    elif pattern.kind == expr.OPERATION:
+        yield from match_operands(pattern.value, pattern.children,
+                                  node.children, wildcards, bindings)
+    elif pattern is node:
+        yield bindings
+
+
+def match_operands(operator, patterns, nodes, wildcards, bindings):
+    """
+    Generates the bindings with which the operand patterns of an operation
+    give the operand nodes.
+    """
+    if not patterns:
+        if not nodes:
+            yield bindings
+        return
+
+    first, others = patterns[0], patterns[1:]
+    sizes = [1]
+    if (operator != '^' and first.kind == expr.SYMBOL
+            and first.value in wildcards):
+        sizes = range(1, len(nodes) - len(others) + 1)
+
+    for size in sizes:
+        if size > len(nodes):
+            break
+        group = expr.make_operation(operator, nodes[:size])
+        for first_bindings in match(first, group, wildcards, bindings):
+            yield from match_operands(operator, others, nodes[size:],
+                                      wildcards, first_bindings)
+
+
+def has_variable_operands(node, wildcards):
+    """
+    Returns whether an operation of a pattern can match operations having
+    more operands than it: whether it is a sum or a product with a wildcard
+    operand.
+    """
+    return node.value != '^' and any(child.kind == expr.SYMBOL
+                                     and child.value in wildcards
+                                     for child in node.children)
+
+
+def node_key(node):
+    """
+    Returns the key of a node of an expression in the discrimination tree.
+    """
+    if node.kind == expr.OPERATION:
+        return (node.kind, node.value, len(node.children))
+    return (node.kind, node.value)
+
+
+def pattern_keys(pattern, wildcards):
+    """
+    Returns the keys of the nodes of a pattern in prefix order. The operands
+    of an operation with a variable number of operands are not part of them.
+    """
+    keys = []
+    to_visit = [pattern]
+    while to_visit:
+        node = to_visit.pop()
+        if node.kind == expr.SYMBOL and node.value in wildcards:
+            keys.append(WILDCARD)
+        elif (node.kind == expr.OPERATION
+              and has_variable_operands(node, wildcards)):
+            keys.append((node.kind, node.value, ANY_NUMBER))
+        else:
+            keys.append(node_key(node))
+            to_visit.extend(reversed(node.children))
+    return keys
+
+
+class RewriteIndex:
+    """
+    Discrimination tree of the RewriteRule of a library.
+
+    Attributes
+    **********
+    - rules: the RewriteRule of the index, in the order they were added.
+    - trie: the root of the discrimination tree. Every node is a dictionary
+            giving the next node by key, and the list of the rules ending
+            there under RULES.
+    - source_hash: the library_hash() of the library this index was built
+                   from, or None.
+    """
+
+    def __init__(self, rules=(), source_hash=None):
+        """
+        Instanciates the attributes and adds the rules given.
+        """
+        self.rules = []
+        self.trie = {}
+        self.source_hash = source_hash
+        for rule in rules:
+            self.add_rule(rule)
+
+    def add_rule(self, rule):
+        """
+        Adds a rule to the index.
+        """
+        self.rules.append(rule)
+        trie_node = self.trie
+        for key in pattern_keys(rule.pattern, rule.wildcards):
+            trie_node = trie_node.setdefault(key, {})
+        trie_node.setdefault(RULES, []).append(rule)
+
+    def candidate_rules(self, node):
+        """
+        Returns the rules whose pattern may match the node: the ones whose
+        path in the discrimination tree is followed by the node. The
+        operands of operations with a variable number of operands still have
+        to be compared (see matches()).
+        """
+        candidates = []
+        # Each state is a node of the trie and the subexpressions still to
+        # read, the next one being the last.
+        states = [(self.trie, (node,))]
+        while states:
+            trie_node, remaining = states.pop()
+            if not remaining:
+                candidates.extend(trie_node.get(RULES, ()))
+                continue
+
+            current, remaining = remaining[-1], remaining[:-1]
+            next_node = trie_node.get(WILDCARD)
+            if next_node is not None:
+                states.append((next_node, remaining))
+            if current.kind == expr.OPERATION:
+                any_key = (current.kind, current.value, ANY_NUMBER)
+                next_node = trie_node.get(any_key)
+                if next_node is not None:
+                    states.append((next_node, remaining))
+            next_node = trie_node.get(node_key(current))
+            if next_node is not None:
+                states.append((next_node,
+                               remaining + current.children[::-1]))
+        return candidates
+
+    def matches(self, node, skipped=()):
+        """
+        Generates the rules matching a node with the parameters to give to
+        their theorem class, as (rule, params), params being a tuple of
+        strings. Rules of the theorem classes in skipped are not used.
+        """
+        for rule in self.candidate_rules(node):
+            if rule.theorem_class in skipped:
+                continue
+            for bindings in match(rule.pattern, node, rule.wildcards, {}):
+                yield rule, tuple(bindings[unknown].text
+                                  for unknown in rule.unknowns)
+
+    def justifications(self, old_node, new_node, skipped=()):
+        """
+        Generates the theorem instances stating that old_node equals
+        new_node, using the rules of this index. Rules of the theorem classes
+        in skipped are not used.
+        """
+        for rule, params in self.matches(old_node, skipped):
+            theorem = instantiate(rule.theorem_class, params)
+            if theorem is None:
+                continue
+            # The simplifications are computed by the theorem
+            old_part, new_tree = rule.instance_sides(theorem)
+            if old_part == old_node.text and new_tree is new_node:
+                yield theorem
+
+    def save(self, file_name):
+        """
+        Saves this index in a file, using pickle.
+        """
+        with open(file_name, 'wb') as file:
+            pickle.dump(self, file, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(file_name):
+        """
+        Returns the index saved in a file by save(). Its theorem classes must
+        be importable.
+        """
+        with open(file_name, 'rb') as file:
+            return pickle.load(file)
+
+
+def build_index(library=None, excluded=None):
+    """
+    Returns the RewriteIndex of the proven theorems of a library (see
+    library_classes()), without the theorems depending on the excluded
+    theorem class.
+    """
+    theorem_classes = library_classes(library)
+    source_hash = None
+    if excluded is None:
+        source_hash = library_hash(theorem_classes)
+    return RewriteIndex(build_rules(theorem_classes, excluded), source_hash)
+
+
+_INDEXES = {}
+
+
+def get_index(library=None, excluded=None):
+    """
+    Returns the index of a library without the theorems depending on the
+    excluded theorem class, building it only the first time.
+    """
+    key = (tuple(library_classes(library)), excluded)
+    if key not in _INDEXES:
+        _INDEXES[key] = build_index(library, excluded)
+    return _INDEXES[key]
+
+
+def load_index(file_name, library=None):
+    """
+    Returns the index of a library saved in a file, building it (and saving
+    it) again if the file does not exist or if the library changed since.
+    """
+    theorem_classes = library_classes(library)
+    source_hash = library_hash(theorem_classes)
+    try:
+        index = RewriteIndex.load(file_name)
+        if index.source_hash == source_hash:
+            return index
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+            ImportError):
+        pass
+
+    index = RewriteIndex(build_rules(theorem_classes), source_hash)
+    index.save(file_name)
+    return index
@@ -6,19 +6,47 @@ CONSTANTS
 *********
 - OPERATION_ORDER: Give the order of operation for the defined operators.
 - PARENTHESIS_ORDER: Gives how much parenthesis add to the order of operations.
-- IMPOSSIBLE_CHARACTER: A sequence of chararacters that can never show up in a
-                        mathematical expression. It is therefore safe to
-                        use as a temporary expression.
+- ALLOWED_TRANSITIONS: allowed[a][b] tells whether a token of class b can
+                       follow a token of class a (see character_code()).
 
 Created on Fri Apr 16 18:30:42 2021
 @author: Joachim Favre & Alberts Reisons
 """
+from collections import Counter
+from functools import lru_cache
+import re
+import string as string_module
 
 
 OPERATION_ORDER = {'+': 0, '*': 1, '^': 2}
 PARENTHESIS_ORDER = 3
 
-IMPOSSIBLE_CHARACTER = "+#@=={}==@#+"
+# allowed[a, b] : a -> last character / b -> new character
+# indices using character_code
+# "empty" = beginning / end of expression
+ALLOWED_TRANSITIONS = [[True,  True,  True,  False, True,  False],
+                       [True,  True,  False, True,  False, True],
+                       [True,  False, False, True,  False, True],
+                       [False, True,  True,  False, True,  False],
+                       [False, True,  True,  False, True,  False],
+                       [True,  False, False, True,  False, True]]
+
+# Translation table giving the character_code() of every valid character, as
+# a digit. Other characters are kept, and are thus not digits from 0 to 5.
+CHARACTER_CODES = str.maketrans(
+    {**{character: '1' for character in string_module.digits},
+     **{character: '2' for character in string_module.ascii_letters},
+     **{character: '3' for character in "+*^="},
+     '(': '4', ')': '5'})
+
+# Matches an invalid character or two codes that cannot follow each other.
+FORBIDDEN_TRANSITION = re.compile("[^0-5]|" + "|".join(
+    str(last) + str(new)
+    for last, row in enumerate(ALLOWED_TRANSITIONS)
+    for new, allowed in enumerate(row) if not allowed))
+
+# A number, an identifier (letters) or any other character.
+TOKEN = re.compile(r"[0-9]+|[A-Za-z]+|\S")
 
 
 def full_concatenate(str_list):
@@ -26,10 +54,7 @@ def full_concatenate(str_list):
     Takes a list of string in parameters and returns the full concatenation
     of those strings.
     """
-    result = ""
-    for element in str_list:
-        result += element
-    return result
+    return "".join(str_list)
 
 
 def remove_spaces(string):
@@ -126,6 +151,28 @@ def verify_order_operation(left, center, right):
     return True
 
 
+def common_prefix_length(first, second):
+    """
+    Returns the length of the longest common prefix of two strings.
+    """
+    length = min(len(first), len(second))
+    index = 0
+    while index < length and first[index] == second[index]:
+        index += 1
+    return index
+
+
+def common_suffix_length(first, second):
+    """
+    Returns the length of the longest common suffix of two strings.
+    """
+    length = min(len(first), len(second))
+    index = 0
+    while index < length and first[-1 - index] == second[-1 - index]:
+        index += 1
+    return index
+
+
 def only_one_modification(old_statement, new_statement, modification):
     """
     Verifies that there was only one modification from the old statement
@@ -133,58 +180,98 @@ def only_one_modification(old_statement, new_statement, modification):
     parameters. Also verifies if the modification can be done according
     to a basic test with order of operations.
     This only works for equalities.
+
+    The old and new statements must share everything outside of the
+    modified part, so the modification can only start at a position that
+    is not after their common prefix, and must end in their common suffix.
+    Computing both gives a small window of possible positions, which are
+    the only ones tested.
     """
     modification = modification.split('=')
     if len(modification) != 2:
         return False
 
-    possibilities = old_statement.count(modification[0])
-
-    for possibility in range(possibilities):
-        formatted_old_stmt = old_statement.replace(modification[0], '{}')
+    old_part, new_part = modification
+    if old_part == "":
+        return False
 
-        modifications = [modification[0]]*(possibilities - 1)
-        modifications.insert(possibility, modification[1])
+    old_length = len(old_statement)
+    if len(new_statement) - old_length != len(new_part) - len(old_part):
+        return False
 
-        if formatted_old_stmt.format(*modifications) == new_statement:
-            modifications = [modification[0]]*(possibilities - 1)
-            modifications.insert(possibility, IMPOSSIBLE_CHARACTER)
+    prefix = common_prefix_length(old_statement, new_statement)
+    suffix = common_suffix_length(old_statement, new_statement)
 
-            formatted_old_stmt = formatted_old_stmt.format(*modifications)
-            lhs, rhs = formatted_old_stmt.split(IMPOSSIBLE_CHARACTER)
+    first_position = max(0, old_length - len(old_part) - suffix)
+    last_position = min(prefix, old_length - len(old_part))
 
-            return verify_order_operation(lhs, modification[1], rhs)
+    for position in range(first_position, last_position + 1):
+        if (old_statement.startswith(old_part, position)
+                and new_statement.startswith(new_part, position)):
+            lhs = old_statement[:position]
+            rhs = old_statement[position + len(old_part):]
+            if verify_order_operation(lhs, new_part, rhs):
+                return True
     return False
 
 
-def replace_using_dict(string, replacement_dictionary):
+def character_fingerprint(string):
     """
-    Replaces a string using a replacement dictionary. For example,
-    "a + b = 7" with {"a": "x", "b": y} becomes "x + y = 7".
-    Does a temporary step in order to be careful with dictionaries such
-    as {'a': 'b', 'b': 'a'} (that switch values).
+    Returns the multiset of the characters of a string, as a hashable
+    object. Two strings that only differ by the order of their characters
+    have the same fingerprint.
     """
-    # we need to do a temporary step to be careful with a dictionary such as
-    # {'a': 'b', 'b': 'a'}
-    string_2_temp = {}
-    temp_2_result = {}
-    for index, key in enumerate(replacement_dictionary):
-        result = replacement_dictionary[key]
-        temp_key = IMPOSSIBLE_CHARACTER.format(index)
-        string_2_temp[key] = temp_key
-        temp_2_result[temp_key] = result
+    return frozenset(Counter(string).items())
 
-    # temp step
-    for key in string_2_temp:
-        replacement = string_2_temp[key]
-        string = string.replace(key, replacement)
 
-    # end step
-    for key in temp_2_result:
-        replacement = temp_2_result[key]
-        string = string.replace(key, replacement)
+def fingerprint_before_modification(new_statement, modification):
+    """
+    Returns the character_fingerprint() that a statement must have so that
+    applying the modification to it gives new_statement. Returns None if
+    no statement can lead to new_statement using this modification.
+    """
+    modification = modification.split('=')
+    if len(modification) != 2:
+        return None
 
-    return string
+    old_part, new_part = modification
+    characters = Counter(new_statement)
+    characters.subtract(new_part)
+    if min(characters.values(), default=0) < 0:
+        return None
+    characters.update(old_part)
+    return frozenset((character, count)
+                     for character, count in characters.items()
+                     if count > 0)
+
+
+@lru_cache(maxsize=256)
+def get_replacement_pattern(keys):
+    """
+    Returns a compiled regular expression matching any key of the tuple
+    given (the longest first), as its only group. It is cached, so that
+    theorems of the same class, which always have the same unknowns, share
+    the same pattern.
+    """
+    keys = sorted(keys, key=len, reverse=True)
+    return re.compile("(" + "|".join(re.escape(key) for key in keys) + ")")
+
+
+def replace_using_dict(string, replacement_dictionary):
+    """
+    Replaces a string using a replacement dictionary. For example,
+    "a + b = 7" with {"a": "x", "b": y} becomes "x + y = 7".
+    Every key is replaced at the same time, in one pass over the string, so
+    dictionaries such as {'a': 'b', 'b': 'a'} (that switch values) work as
+    expected.
+    """
+    if not replacement_dictionary:
+        return string
+    pattern = get_replacement_pattern(tuple(replacement_dictionary))
+    # Splitting on a group gives the keys found at the odd indices.
+    parts = pattern.split(string)
+    parts[1::2] = [replacement_dictionary[key] for key in parts[1::2]]
+    return "".join(parts)
 
 
 def upper_case_first_letter(text):
@@ -196,18 +283,6 @@ def upper_case_first_letter(text):
     return result
 
 
-def evaluate_expression(expression):
-    """
-    Evaluate a mathematical expression (such as 1+2). Pylint say that
-    eval(expression) should be replaced by ast.literal_eval(expression), but
-    this function does nto evaluate decimals.
-    """
-    expression = expression.replace('^', '**')
-    # It is said that eval(expression) should be replaced by
-    # ast.literal_eval(expression) ; however, it does not evaluate decimals.
-    return eval(expression)
-
-
 def is_number(character):
     """
     Returns whether the character is a number.
@@ -264,41 +339,37 @@ def character_code(character):
     return None
 
 
+def tokenize(expression):
+    """
+    Splits an expression into tokens, ignoring spaces: a number of many
+    digits is one token, and so are many letters following each others
+    (which is not a valid unknown, see verify_maths()). Every other
+    character is a token on its own.
+    """
+    return TOKEN.findall(expression)
+
+
 def verify_maths(expression):
     """
     Verifies that an expression makes sense mathematically speaking. It
     looks at two characters following each others, and defines whether it
-    makes sense or not using a matrix. It also verifies if there is the
-    same number of opening parenthesis as closing ones. Make sure
-    to use this function on both sides of an equality to avoid things such as:
+    makes sense or not using the ALLOWED_TRANSITIONS matrix. It also verifies
+    if there is the same number of opening parenthesis as closing ones. Make
+    sure to use this function on both sides of an equality to avoid things
+    such as:
         (a + b = c) * d
-    """
 
+    The whole expression is converted to its character codes at once using
+    CHARACTER_CODES, surrounded by the code of the "empty" character, and
+    FORBIDDEN_TRANSITION looks for any pair of codes that is not allowed.
+    Digits can follow each others (a number of many digits), but letters
+    cannot (an unknown is only one letter).
+    """
     if expression.count('(') != expression.count(')'):
         return False
 
-    # allowed[a, b] : a -> last character / b -> new character
-    # indices using character_code
-    # "empty" = beginning / end of expression
-    allowed = [[True,  True,  True,  False, True,  False],
-               [True,  True,  False, True,  False, True],
-               [True,  False, False, True,  False, True],
-               [False, True,  True,  False, True,  False],
-               [False, True,  True,  False, True,  False],
-               [True,  False, False, True,  False, True]]
-
-    last_character = 0
-
-    for character in remove_spaces(expression):
-        character = character_code(character)
-        if character is None:
-            return False
-        if not allowed[last_character][character]:
-            return False
-        last_character = character
-
-    # Can finish on this character ?
-    return allowed[last_character][0]
+    codes = "0" + remove_spaces(expression).translate(CHARACTER_CODES) + "0"
+    return FORBIDDEN_TRANSITION.search(codes) is None
 
 
 def extract_unknowns(expression):
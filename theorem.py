@@ -11,7 +11,15 @@ if and only if's).
 Created on Fri Apr 16 18:31:01 2021
 @author: Joachim Favre & Alberts Reisons
 """
+from collections import namedtuple
+import sys
+import weakref
+
 import text_gestion as tg
+import expression as expr
+import evaluation
+import profiling as prof
+import theorem_graph as tgraph
 
 
 NOT_RIGHT_NUMBER_PARAMETERS_MESSAGE = ("You did not give the right number of "
@@ -24,6 +32,9 @@ NOT_RIGHT_NUMBER_PARAMETERS_MESSAGE = ("You did not give the right number of "
 NOT_A_NUMBER_MESSAGE = ("You did not give a number when it was expected for a "
                         "simplification.")
 
+SIMPLIFICATION_TOO_BIG_MESSAGE = ("A simplification gave a number which is "
+                                  "too big. {}")
+
 PROOF_NOT_FINISHED_MESSAGE = ("You gave to a theorem a proof which was "
                               "not finished. Do not forget to call "
                               "proof.conclude().")
@@ -49,13 +60,80 @@ NON_EXISTING_UNKNOWN_MESSAGE = ("You are trying to use the unknown {}, which "
 
 
 THEOREM_RECURSION_MESSAGE = ("You are using a theorem A to prove a theorem B "
-                             "and B to prove A (or you have a huge depth of "
-                             "theorem using other theorems for their proof; "
-                             "in that case, you may want to consider to "
-                             "increase the recursion depth). You cannot do "
+                             "and B to prove A. Here, the theorems used in "
+                             "the proofs form the cycle {}. You cannot do "
                              "that, that's illegal!")
 
 
+# Proofs that have already been verified, keyed by theorem class. The proof
+# of a theorem does not depend on the parameters it is instantiated with, so
+# it only needs to be verified once per class.
+VERIFIED_PROOFS = {}
+
+# Theorem classes whose proof is being verified, the outermost first.
+VERIFICATION_STACK = []
+
+# Unknowns and simplifications of theorems, so that the equal ones (those of
+# the instances of a class) are only stored once.
+_INTERNED_TUPLES = {}
+
+# Optional verification_cache.VerificationCache, storing verified proofs on
+# disk between runs. It is set using use_verification_cache().
+VERIFICATION_CACHE = None
+
+# Whether proofs are only verified when they are needed, instead of when a
+# theorem is instantiated. It is set using use_lazy_verification().
+LAZY_VERIFICATION = False
+
+# Every theorem class, added when it is defined (see
+# Theorem.__init_subclass__()).
+_THEOREM_CLASSES = weakref.WeakSet()
+
+
+def use_verification_cache(cache):
+    """
+    Sets the verification cache used to load the proofs that were already
+    verified during a previous run (None to disable it).
+    """
+    global VERIFICATION_CACHE
+    VERIFICATION_CACHE = cache
+
+
+def use_lazy_verification(lazy):
+    """
+    Sets whether the proof of a theorem is verified when the theorem is
+    instantiated (the default) or only when it is first needed: when its
+    proof is read, for instance by is_proven() or for its LaTeX code. In the
+    lazy mode, instantiating a theorem that is never used in a proof (or
+    whose class was already verified) only makes its substitutions.
+
+    The LaTeX code of proofs may then differ from the one of the default
+    mode, since theorems are verified in another order.
+    """
+    global LAZY_VERIFICATION
+    LAZY_VERIFICATION = lazy
+
+
+def module_theorem_classes(module):
+    """
+    Returns the theorem classes defined in a module (and not the ones it
+    imports), sorted by name. They are found in the classes registered when
+    they were defined, so the module does not need to be inspected.
+    """
+    return sorted((theorem_class for theorem_class in _THEOREM_CLASSES
+                   if theorem_class.__module__ == module.__name__),
+                  key=lambda theorem_class: theorem_class.__qualname__)
+
+
+def intern_tuple(values):
+    """
+    Returns a tuple of the values given, which is the same object for every
+    equal tuple returned by this function.
+    """
+    values = tuple(values)
+    return _INTERNED_TUPLES.setdefault(values, values)
+
+
 class NotRightNumberOfParametersError(Exception):
     """
     An exception that is thrown when a theorem did not get enough parameters
@@ -78,6 +156,18 @@ class NotANumberError(Exception):
         super().__init__(NOT_A_NUMBER_MESSAGE)
 
 
+class SimplificationTooBigError(Exception):
+    """
+    An exception that is thrown when a simplification gives a number which
+    is too big to be evaluated or written.
+    """
+
+    def __init__(self, reason):
+        message = SIMPLIFICATION_TOO_BIG_MESSAGE
+        message = message.format(reason)
+        super().__init__(message)
+
+
 class ProofNotFinishedError(Exception):
     """
     An exception that is thrown when a theorem's proof was not concluded. This
@@ -132,16 +222,45 @@ class NonExistingUnknownError(Exception):
 
 class TheoremRecursionError(Exception):
     """
-    An exception that is thrown after max recursion depth has been reached.
-    It is very probable that it comes from the user trying to prove
-    theorem A with theorem B and B with A.
+    An exception that is thrown when a theorem is used (maybe indirectly) to
+    prove itself. This comes from the user trying to prove theorem A with
+    theorem B and B with A. The cycle is given as a list of theorem classes,
+    starting and ending with the same one.
     """
 
-    def __init__(self):
-        super().__init__(THEOREM_RECURSION_MESSAGE)
+    def __init__(self, cycle):
+        message = THEOREM_RECURSION_MESSAGE
+        message = message.format(tgraph.theorem_names(cycle))
+        super().__init__(message)
+        self.cycle = cycle
+
+
+class TheoremReference(namedtuple('TheoremReference',
+                                  ['theorem_class', 'bindings'])):
+    """
+    Reference to a theorem instance, as kept in the dependencies of a proof:
+    the theorem class and the parameters it was instantiated with (as a
+    tuple of strings), instead of the whole instance.
+    """
+
+    __slots__ = ()
 
 
-class Theorem():
+class TheoremMeta(type):
+    """
+    Metaclass of the theorem classes. It gives an empty __slots__ to every
+    theorem class that does not define one, so that theorem instances do
+    not have a __dict__: theorem classes usually only call the constructor
+    of their parent class. A theorem class storing attributes of its own
+    must list them in its __slots__.
+    """
+
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        namespace.setdefault('__slots__', ())
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+
+class Theorem(metaclass=TheoremMeta):
     """
     Theorem "abstract" class. As mentioned in the main docstring, it is not
     merged with the Equality class to show an opening with an Implication
@@ -151,12 +270,35 @@ class Theorem():
     **********
     - name: the name of this theorem. It is used for LaTeX code generation.
     - conclusion: the conclusion of this theorem; what it says.
-    - unknowns: the unknowns of this theorem.
+    - unknowns: the unknowns of this theorem, as a tuple.
     - simplifications: the simplification that must be done mathematically
                        (such c = 1 + 2) for this theorem. They are under the
-                       form of list of lists: [[name, expression], ...]
+                       form of a tuple of pairs: ((name, expression), ...)
+    - proof: the verified proof of this theorem, or None for an axiom. It is
+             shared by all the instances of a class (see VERIFIED_PROOFS).
+
+    The name, the conclusion, the unknowns and the simplifications are
+    interned, so that they are shared by all the instances of a class.
+
+    Class attributes
+    ****************
+    - or_known_in_parenthesis: whether the LaTeX code says that the unknowns
+                               can also be known between parenthesis (the
+                               default) or without them.
     """
 
+    __slots__ = ('name', 'conclusion', 'unknowns', 'simplifications')
+
+    or_known_in_parenthesis = True
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Registers every theorem class when it is defined, so that the
+        theorems of a module can be found (see module_theorem_classes()).
+        """
+        super().__init_subclass__(**kwargs)
+        _THEOREM_CLASSES.add(cls)
+
     def __init__(self, name=None, conclusion=None, unknowns=None,
                  simplifications=None):
         """
@@ -165,11 +307,11 @@ class Theorem():
         """
         if name is None:
             name = "[undefined theorem name]"
-        self.name = name
+        self.name = sys.intern(name)
 
         if conclusion is None:
             conclusion = ""
-        self.conclusion = conclusion
+        self.conclusion = conclusion = sys.intern(conclusion)
 
         if unknowns is None:
             unknowns = []
@@ -178,7 +320,7 @@ class Theorem():
                 if len(unknown) != 1 or not tg.is_letter(unknown):
                     raise BadUnknownNameError
 
-        self.unknowns = unknowns
+        self.unknowns = intern_tuple(unknowns)
 
         if simplifications is None:
             simplifications = []
@@ -187,20 +329,93 @@ class Theorem():
                 if len(simpl_name) != 1 or not tg.is_letter(simpl_name):
                     raise BadUnknownNameError
 
-        simpl_no_space = []
-        for simplification in simplifications:
-            simplification[1] = tg.remove_spaces(simplification[1])
-            simpl_no_space.append(simplification)
-        self.simplifications = simpl_no_space
+        self.simplifications = intern_tuple(
+            (simpl_name, tg.remove_spaces(expression))
+            for simpl_name, expression in simplifications)
 
         self.verify_has_instantiated_every_character(conclusion)
 
+        if not LAZY_VERIFICATION:
+            self.get_verified_proof()
+
+    @property
+    def proof(self):
+        """
+        The proof of this theorem, verified the first time a theorem of this
+        class needs it (see get_verified_proof()).
+        """
+        return self.get_verified_proof()
+
+    def reference(self):
+        """
+        Returns the TheoremReference of this theorem.
+        """
+        return TheoremReference(type(self), ())
+
+    def get_verified_proof(self):
+        """
+        Returns the proof of this theorem, verifying it only the first time
+        a theorem of this class is instantiated. The following instances
+        reuse the proof stored in VERIFIED_PROOFS. If a VERIFICATION_CACHE
+        is used, the proof is loaded from it when it is still valid.
+        """
+        theorem_class = type(self)
+        if theorem_class in VERIFIED_PROOFS:
+            return VERIFIED_PROOFS[theorem_class]
+
+        if theorem_class in VERIFICATION_STACK:
+            # Used in its own proof, through theorems that were not found by
+            # verify_dependencies_first().
+            index = VERIFICATION_STACK.index(theorem_class)
+            raise TheoremRecursionError(VERIFICATION_STACK[index:]
+                                        + [theorem_class])
+
+        self.verify_dependencies_first()
+
+        VERIFICATION_STACK.append(theorem_class)
         try:
-            # It is normal to get a None from this proof.
-            # This is not an error...
-            self.proof = self.get_proof()
-        except RecursionError:
-            raise TheoremRecursionError
+            proof = None
+            if VERIFICATION_CACHE is not None:
+                with prof.stage("cache", theorem_class):
+                    proof = VERIFICATION_CACHE.load(self)
+
+            if proof is None:
+                # It is normal to get a None from this proof.
+                # This is not an error...
+                with prof.stage("proof", theorem_class):
+                    proof = self.get_proof()
+
+                if VERIFICATION_CACHE is not None:
+                    with prof.stage("cache", theorem_class):
+                        VERIFICATION_CACHE.store(self, proof)
+        finally:
+            VERIFICATION_STACK.pop()
+
+        VERIFIED_PROOFS[theorem_class] = proof
+        return proof
+
+    def verify_dependencies_first(self):
+        """
+        Verifies the theorems named in the proof of this theorem (and their
+        own dependencies) before this one, in an order such that every
+        theorem comes after all of its dependencies. Thus, the instances
+        built while verifying a proof are already verified, and the depth of
+        the verification does not grow with the length of a chain of
+        theorems. Raises a TheoremRecursionError if those theorems form a
+        cycle.
+        """
+        theorem_class = type(self)
+        graph = tgraph.VERIFICATION_GRAPH
+        with prof.stage("dependency_graph", theorem_class):
+            graph.add_static_dependencies(theorem_class, VERIFIED_PROOFS)
+            order, cycle = graph.depth_first_search(theorem_class,
+                                                    VERIFIED_PROOFS)
+        if cycle is not None:
+            raise TheoremRecursionError(cycle)
+
+        for dependency in order:
+            if dependency is not theorem_class:
+                dependency(None).get_verified_proof()
 
     def get_proof(self):
         """
@@ -255,8 +470,18 @@ class Equality(Theorem):
     ***************************************
     - left_hand_side: left hand side of the conclusion
     - right_hand_side: right hand side of the conclusion
+    - left_hand_side_tree: parsed tree of the left hand side
+    - right_hand_side_tree: parsed tree of the right hand side
+    - bindings: the parameters replacing the unknowns, as a tuple of
+                strings without spaces.
+
+    The parameters replace the unknowns in the parsed trees of the
+    conclusion, which gives both the trees and the texts of the sides.
     """
 
+    __slots__ = ('left_hand_side', 'right_hand_side', 'left_hand_side_tree',
+                 'right_hand_side_tree', 'bindings')
+
     def __init__(self, param_list=None, name=None, conclusion=None,
                  unknowns=None, simplifications=None):
         """
@@ -271,65 +496,98 @@ class Equality(Theorem):
             raise NotRightNumberOfParametersError(len(self.unknowns),
                                                   len(param_list))
 
+        theorem_class = type(self)
         lhs, rhs = self.conclusion.split('=')
         lhs = tg.remove_spaces(lhs)
         rhs = tg.remove_spaces(rhs)
 
-        if not (tg.verify_maths(lhs) and tg.verify_maths(rhs)):
+        with prof.stage("verify_maths", theorem_class):
+            sides_ok = tg.verify_maths(lhs) and tg.verify_maths(rhs)
+        if not sides_ok:
             raise EqualitySideNotOkForMathsError
 
-        if param_list is None:
-            if len(self.simplifications) != 0:
-                raise NotANumberError
-        else:
-            replacement_dictionary = {}
-            for unknown, param in zip(self.unknowns, param_list):
-                replacement_dictionary[unknown] = tg.remove_spaces(param)
+        self.bindings = tuple(tg.remove_spaces(param) for param in param_list)
+        replacement_dictionary = dict(zip(self.unknowns, self.bindings))
 
+        with prof.stage("replacement", theorem_class):
             for simplification in self.simplifications:
                 unknown, equality = simplification
                 equality = tg.replace_using_dict(equality,
                                                  replacement_dictionary)
                 try:
-                    evaluation = tg.evaluate_expression(equality)
-                    replacement_dictionary[unknown] = str(evaluation)
-                except NameError:
+                    value = evaluation.evaluate_expression(equality)
+                    replacement_dictionary[unknown] = str(value)
+                except evaluation.NotEvaluableError:
                     raise NotANumberError
+                except evaluation.EvaluationLimitError as error:
+                    raise SimplificationTooBigError(error)
 
-            lhs = tg.replace_using_dict(lhs, replacement_dictionary)
-            rhs = tg.replace_using_dict(rhs, replacement_dictionary)
-
-            for side in [lhs, rhs]:
-                for key in replacement_dictionary:
-                    replaced_by = replacement_dictionary[key]
-                    side_splitted = side.split(replaced_by)
-                    for index in range(len(side_splitted) - 1):
-                        left = side_splitted[index]
+        with prof.stage("substitution", theorem_class):
+            lhs_tree, rhs_tree = self.substitute_unknowns(
+                [lhs, rhs], replacement_dictionary)
 
-                        if index == len(side_splitted) - 1:
-                            right = ""
-                        else:
-                            right = side_splitted[index + 1]
+        self.left_hand_side = lhs = lhs_tree.text
+        self.right_hand_side = rhs = rhs_tree.text
 
-                        if not tg.verify_order_operation(left, replaced_by,
-                                                         right):
-                            raise BadOperationOrderInReplacementError
+        with prof.stage("verify_maths", theorem_class):
+            sides_ok = tg.verify_maths(lhs) and tg.verify_maths(rhs)
+        if not sides_ok:
+            raise EqualitySideNotOkForMathsError
 
-        self.left_hand_side = lhs
-        self.right_hand_side = rhs
+        self.left_hand_side_tree = lhs_tree
+        self.right_hand_side_tree = rhs_tree
 
-        if not (tg.verify_maths(lhs) and tg.verify_maths(rhs)):
+    @staticmethod
+    def substitute_unknowns(sides, replacement_dictionary):
+        """
+        Returns the trees of the sides of the conclusion given, after
+        replacing their unknowns using replacement_dictionary.
+
+        The replacement is done on the parsed trees, so the text of a result
+        is the text of the side where every unknown was replaced. Since no
+        parenthesis is added, a replacement must bind at least as tightly as
+        the operation it is placed in (see expr.can_replace()); otherwise,
+        a BadOperationOrderInReplacementError is raised. The operations
+        containing each unknown are found once per conclusion (see
+        expr.symbol_contexts()), so this takes a time linear in the size of
+        the result.
+        """
+        try:
+            templates = [expr.parse(side) for side in sides]
+            replacements = {unknown: expr.parse(value) for unknown, value
+                            in replacement_dictionary.items()}
+        except expr.InvalidExpressionError:
             raise EqualitySideNotOkForMathsError
 
+        for template in templates:
+            contexts = expr.symbol_contexts(template)
+            for unknown, operators in contexts.items():
+                replacement = replacements.get(unknown)
+                if replacement is None:
+                    continue
+                for operator in operators:
+                    if not expr.can_replace(replacement, operator):
+                        raise BadOperationOrderInReplacementError
+
+        return [expr.substitute(template, replacements)
+                for template in templates]
+
+    def reference(self):
+        """
+        Returns the TheoremReference of this theorem, with its bindings.
+        """
+        return TheoremReference(type(self), self.bindings)
+
     def is_held(self, equality):
         """
-        Verifies if an equality is held. This uses the left_hand_side and
-        right_hand_side attributes.
+        Verifies if an equality is held. This compares the parsed sides of
+        the equality with the left_hand_side_tree and right_hand_side_tree
+        attributes (trees are interned, so this is an identity comparison).
         """
-        splitted_equality = equality.split('=')
-        if len(splitted_equality) != 2:
+        sides = expr.parse_equality(equality)
+        if sides is None:
             return False
 
-        lhs = self.left_hand_side
-        rhs = self.right_hand_side
-        return lhs in splitted_equality and rhs in splitted_equality
+        lhs = self.left_hand_side_tree
+        rhs = self.right_hand_side_tree
+        return lhs in sides and rhs in sides
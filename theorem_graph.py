@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Defines the TheoremGraph class.
+
+A theorem graph records which theorem classes are used in the proof of which
+other theorem classes. Edges are found in two ways: statically, by looking
+at the theorems named in the get_proof() method of a class, and while
+verifying, every time Proof.evolve_equality() uses a theorem. This allows to
+detect a theorem used (indirectly) in its own proof before verifying
+anything, and to verify the dependencies of a theorem in order instead of
+recursively.
+
+CONSTANTS
+*********
+- VERIFICATION_GRAPH: the graph used while verifying theorems.
+
+Created on Sat Oct 17 14:58:23 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+import inspect
+
+# theorem imports this module, so only use it in functions
+import theorem as thm
+
+
+def is_theorem_class(obj):
+    """
+    Returns whether an object is a theorem class.
+    """
+    return inspect.isclass(obj) and issubclass(obj, thm.Theorem)
+
+
+def static_dependencies(theorem_class):
+    """
+    Returns the theorem classes named in the get_proof() method of a theorem
+    class. Theorems are found in the global and nonlocal variables of the
+    method, in the default values of its parameters, and as attributes of
+    the modules it uses (such as thmset.SquareDistribution).
+    """
+    get_proof = theorem_class.get_proof
+    if get_proof is thm.Theorem.get_proof:
+        return []
+
+    closure_vars = inspect.getclosurevars(get_proof)
+    values = list(closure_vars.globals.values())
+    values.extend(closure_vars.nonlocals.values())
+    values.extend(get_proof.__defaults__ or ())
+    values.extend((get_proof.__kwdefaults__ or {}).values())
+
+    dependencies = []
+    modules = []
+    for value in values:
+        if is_theorem_class(value):
+            dependencies.append(value)
+        elif inspect.ismodule(value):
+            modules.append(value)
+
+    for name in sorted(closure_vars.unbound):
+        for module in modules:
+            value = getattr(module, name, None)
+            if is_theorem_class(value):
+                dependencies.append(value)
+
+    result = []
+    for dependency in dependencies:
+        if dependency is not theorem_class and dependency not in result:
+            result.append(dependency)
+    return result
+
+
+def theorem_names(theorem_classes):
+    """
+    Returns the names of theorem classes, separated by arrows.
+    """
+    return " -> ".join(theorem_class.__name__
+                       for theorem_class in theorem_classes)
+
+
+class TheoremGraph:
+    """
+    Directed graph between theorem classes: there is an edge from A to B if
+    B is used in the proof of A.
+
+    Attributes
+    **********
+    - edges: the dependencies of each theorem class, in the order they
+             were added.
+    - explored: the theorem classes whose static dependencies were added.
+    """
+
+    def __init__(self):
+        """
+        Instanciates the attributes of an empty graph.
+        """
+        self.edges = {}
+        self.explored = set()
+
+    def add_theorem(self, theorem_class):
+        """
+        Adds a theorem class to the graph, without any edge.
+        """
+        self.edges.setdefault(theorem_class, [])
+
+    def add_edge(self, theorem_class, dependency_class):
+        """
+        Records that dependency_class is used in the proof of theorem_class.
+        """
+        self.add_theorem(dependency_class)
+        dependencies = self.edges.setdefault(theorem_class, [])
+        if dependency_class not in dependencies:
+            dependencies.append(dependency_class)
+
+    def dependencies(self, theorem_class):
+        """
+        Returns the dependencies of a theorem class that are known so far.
+        """
+        return self.edges.get(theorem_class, [])
+
+    def add_static_dependencies(self, theorem_class, skip=()):
+        """
+        Adds the static_dependencies() of a theorem class, and of all the
+        theorems they lead to. Theorems in skip (such as already verified
+        ones) are not explored.
+        """
+        to_visit = [theorem_class]
+        while to_visit:
+            current = to_visit.pop()
+            if current in self.explored or current in skip:
+                continue
+            self.explored.add(current)
+            self.add_theorem(current)
+            for dependency in static_dependencies(current):
+                self.add_edge(current, dependency)
+                to_visit.append(dependency)
+
+    def depth_first_search(self, start, skip=()):
+        """
+        Explores the graph from start without using recursion, ignoring the
+        theorems in skip. Returns the explored theorems in post-order
+        (every theorem after all of its dependencies), and the first cycle
+        found as a list of theorems starting and ending with the same one
+        (None if there is no cycle).
+        """
+        post_order = []
+        finished = set()
+        path = [start]
+        on_path = {start}
+        iterators = [iter(self.dependencies(start))]
+
+        while iterators:
+            dependency = next(iterators[-1], None)
+            if dependency is None:
+                current = path.pop()
+                on_path.discard(current)
+                iterators.pop()
+                finished.add(current)
+                post_order.append(current)
+            elif dependency in on_path:
+                cycle = path[path.index(dependency):] + [dependency]
+                return post_order, cycle
+            elif dependency not in finished and dependency not in skip:
+                path.append(dependency)
+                on_path.add(dependency)
+                iterators.append(iter(self.dependencies(dependency)))
+
+        return post_order, None
+
+    def find_cycle(self, start, skip=()):
+        """
+        Returns a cycle reachable from start, as a list of theorems starting
+        and ending with the same one, or None if there is none.
+        """
+        return self.depth_first_search(start, skip)[1]
+
+    def topological_order(self, start, skip=()):
+        """
+        Returns start and its (recursive) dependencies, every theorem being
+        after all of its dependencies. The graph must not have any cycle
+        reachable from start.
+        """
+        return self.depth_first_search(start, skip)[0]
+
+
+VERIFICATION_GRAPH = TheoremGraph()
@@ -6,22 +6,40 @@ Defines the TheoremGroup class, that allows to group different theorems
 to make compile them in one LaTeX file. This uses randomness for synonyms,
 so do not hesitate to fix random.seed(number) to always get the same result.
 
+When a group is saved, the LaTeX code of each of its sections is also saved
+in a manifest, with a hash of everything it was generated from. A group
+that loads the manifest of a previous run (see load_manifest()) reuses the
+sections whose hash did not change and gives the same labels to the same
+theorems, so that the sections of the theorems that did not change (nor
+their dependencies) stay exactly the same, and an unchanged document is not
+compiled again (see tex.compile_latex()).
+
+CONSTANTS
+*********
+- MANIFEST_EXTENSION: the extension of the manifest of a document, saved
+                      next to its .tex file.
+- MANIFEST_VERSION: the version of the manifests. Manifests of another
+                    version are not used.
+
 Created on Mon May  3 21:25:18 2021
 @author: Joachim Favre & Alberts Reisons
 """
+import os
 import random as rng
 
-import sys
-import inspect
-
 import latex_gestion as tex
+import profiling as prof
 import text_gestion as tg
 import theorem as thm
-import theorem_set as thmset
+import verification_scheduler as vs
 
 import synonyms
 
 
+MANIFEST_EXTENSION = ".sections.json"
+
+MANIFEST_VERSION = 1
+
 PROOF_NOT_FINISHED_MESSAGE = ("You are trying to add a theorem which proof "
                               "was not finished.")
 
@@ -36,6 +54,14 @@ class ProofNotFinishedError(Exception):
         super().__init__(PROOF_NOT_FINISHED_MESSAGE)
 
 
+def section_key(theorem_class):
+    """
+    Returns the key of the section of a theorem class in a manifest: the
+    name of the class, with the module defining it.
+    """
+    return theorem_class.__module__ + ":" + theorem_class.__qualname__
+
+
 class TheoremGroup:
     """
     A class that allows the user to group different theorems (or axiom)
@@ -46,7 +72,9 @@ class TheoremGroup:
 
     This class uses some randomness to have synonyms in the proof. Do not
     hesitate to use random.see(number) to set the see and always have
-    the same result.
+    the same result. Each section uses its own random generator, seeded
+    using the seed of the group and the name of its theorem class, so that
+    it does not depend on the other sections.
 
     Attributes
     **********
@@ -54,12 +82,22 @@ class TheoremGroup:
     - author: the author of the generated LaTeX document
     - already_saved: a list of Theorem class name which have already been
                      saved.
-    - axioms_latex: the LaTeX code of the axioms. It is splitted from the
-                    theorems to have two distinct parts in the generated
-                    document.
-    - theorems_latex: the LaTeX code of the theorems. It is splitted from the
-                      axioms to have two distinct parts in the generated
-                      document.
+    - axioms_latex: the LaTeX code of the axioms, as a list with one string
+                    per section. It is splitted from the theorems to have two
+                    distinct parts in the generated document.
+    - theorems_latex: the LaTeX code of the theorems, as a list with one
+                      string per section. It is splitted from the axioms to
+                      have two distinct parts in the generated document.
+    - seed: the seed of the random generators of the sections, drawn from
+            the random module.
+    - labels: the label number of the section of each theorem class saved.
+    - used_labels: the set of the label numbers that cannot be given to a
+                   new theorem class.
+    - sections: the manifest of this group, giving for each section_key()
+                the hash, the label number and the LaTeX code of its
+                section.
+    - previous_sections: the sections of the manifest loaded by
+                         load_manifest(), which can be reused.
     """
 
     def __init__(self, title, author=r"Joachim Favre \& Alberts Reisons"):
@@ -69,8 +107,13 @@ class TheoremGroup:
         self.title = title
         self.author = author
         self.already_saved = []
-        self.axioms_latex = ""
-        self.theorems_latex = ""
+        self.axioms_latex = []
+        self.theorems_latex = []
+        self.seed = rng.getrandbits(32)
+        self.labels = {}
+        self.used_labels = set()
+        self.sections = {}
+        self.previous_sections = {}
 
     def add_theorem(self, theorem):
         """
@@ -78,40 +121,122 @@ class TheoremGroup:
         also adds its dependecies, and writes the right LaTeX code accordingly.
         """
         if isinstance(theorem, type):
+            if theorem in self.already_saved:
+                return
             theorem = theorem(None)
 
         if not theorem.is_proven():
             raise ProofNotFinishedError
 
-        if type(theorem) in self.already_saved:
+        theorem_class = type(theorem)
+        if theorem_class in self.already_saved:
             return
-        self.already_saved.append(type(theorem))
-        number_already_saved = len(self.already_saved)
+        self.already_saved.append(theorem_class)
+        self.labels[theorem_class] = self.new_label(theorem_class)
 
         if not theorem.is_axiom():
             for dependency in theorem.proof.dependencies:
-                self.add_theorem(dependency)
+                self.add_theorem(dependency.theorem_class)
 
+        with prof.stage("latex", theorem_class):
+            section = self.get_section(theorem)
+        if theorem.is_axiom():
+            self.axioms_latex.append(section)
+        else:
+            self.theorems_latex.append(section)
+
+    def new_label(self, theorem_class):
+        """
+        Returns the label number of the section of a theorem class which is
+        added. It is the one it had in the previous manifest if there is
+        one; otherwise, it is its position in already_saved, or the next
+        number that is not used.
+        """
+        previous = self.previous_sections.get(section_key(theorem_class))
+        if previous is not None:
+            label_number = previous['label']
+        else:
+            label_number = len(self.already_saved) - 1
+            while label_number in self.used_labels:
+                label_number += 1
+        self.used_labels.add(label_number)
+        return label_number
+
+    def get_section_hash(self, theorem):
+        """
+        Returns the hash of everything the section of a theorem is generated
+        from: its statement, its proof, its label and the labels and hashes
+        of the sections of its dependencies (which must already be in this
+        group).
+        """
+        import hashlib  # pylint: disable=import-outside-toplevel
+
+        theorem_class = type(theorem)
+        parts = [str(self.seed), section_key(theorem_class),
+                 str(self.labels[theorem_class]), theorem.name,
+                 theorem.conclusion, repr(theorem.unknowns),
+                 repr(theorem.simplifications),
+                 str(theorem.or_known_in_parenthesis)]
+        if not theorem.is_axiom():
+            parts.append(theorem.proof.latex_code)
+            for dependency in theorem.proof.dependencies:
+                dependency_key = section_key(dependency.theorem_class)
+                parts += [str(self.labels[dependency.theorem_class]),
+                          self.sections[dependency_key]['hash']]
+
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get_section(self, theorem):
+        """
+        Returns the LaTeX code of the section of a theorem, and adds it to
+        the manifest. The section of the previous manifest is reused if its
+        hash did not change.
+        """
+        theorem_class = type(theorem)
+        key = section_key(theorem_class)
+        section_hash = self.get_section_hash(theorem)
+        label_number = self.labels[theorem_class]
+
+        previous = self.previous_sections.get(key)
+        if previous is not None and previous['hash'] == section_hash:
+            section = previous['latex']
+        else:
+            section = self.get_section_latex(theorem, label_number)
+
+        self.sections[key] = {'hash': section_hash, 'label': label_number,
+                              'latex': section}
+        return section
+
+    def get_section_latex(self, theorem, label_number):
+        """
+        Returns the LaTeX code of the section of a theorem, labelled with
+        label_number. Its dependencies must already be in this group, since
+        the proof refers to their sections.
+        """
+        generator = rng.Random("{}:{}".format(self.seed,
+                                              section_key(type(theorem))))
         if theorem.is_axiom():
             colour = r""
         else:
             colour = r""
 
-        latex_code = ("\n\n"
-                      + r"\section{" + colour
-                      + tg.upper_case_first_letter(theorem.name)
-                      + r"\label{"
-                      + str(number_already_saved - 1)
-                      + "}}\n")
+        latex_code = ["\n\n",
+                      r"\section{", colour,
+                      tg.upper_case_first_letter(theorem.name),
+                      r"\label{", str(label_number), "}}\n"]
 
         goal = tex.convert_2_latex(theorem.conclusion)
         if theorem.is_axiom():
-            latex_code += (rng.choice(synonyms.AXIOM_INTRO) + "\n"
-                           + r"\[" + goal + r"\]" + "\n")
+            latex_code += [generator.choice(synonyms.AXIOM_INTRO), "\n",
+                           r"\[", goal, r"\]", "\n"]
         else:
-            latex_code += (r"\subsection{Theorem}" + "\n"
-                           + rng.choice(synonyms.TRYING_TO_SHOW) + "\n"
-                           + r"\[" + goal + r"\]" + "\n")
+            latex_code += [r"\subsection{Theorem}", "\n",
+                           generator.choice(synonyms.TRYING_TO_SHOW), "\n",
+                           r"\[", goal, r"\]", "\n"]
 
         number_unknowns = len(theorem.unknowns)
         number_simp = len(theorem.simplifications)
@@ -119,96 +244,207 @@ class TheoremGroup:
 
             unknowns = [tex.convert_2_latex(unknown)
                         for unknown in theorem.unknowns]
-            latex_code += ("with " +
-                           tex.write_as_list(unknowns)
-                           + " being unknown ")
+            latex_code += ["with ", tex.write_as_list(unknowns),
+                           " being unknown "]
 
-            if isinstance(theorem, thmset.RemovalOfParenthesis):
-                latex_code += "or known"
+            if theorem.or_known_in_parenthesis:
+                latex_code.append("(or known)")
             else:
-                latex_code += "(or known)"
+                latex_code.append("or known")
 
             if number_simp > 0:
-                latex_code += ", and "
+                latex_code.append(", and ")
             else:
-                latex_code += "."
+                latex_code.append(".")
 
         if number_simp > 0:
             simps = [tex.convert_2_latex(equality[0] + "=" + equality[1])
                      for equality in theorem.simplifications]
-            latex_code += ("with "
-                           + tex.write_as_list(simps)
-                           + " getting simplified ")
+            latex_code += ["with ", tex.write_as_list(simps),
+                           " getting simplified "]
             if number_simp > 1:
-                latex_code += "(as numbers)."
+                latex_code.append("(as numbers).")
             else:
-                latex_code += "(as a number)."
+                latex_code.append("(as a number).")
 
         if not theorem.is_axiom():
-            proof_latex = theorem.proof.latex_code
-            for dependency in theorem.proof.dependencies:
-                label_number = self.already_saved.index(type(dependency))
-                ref_call = r"\ref{" + str(label_number) + "}"
-                proof_latex = proof_latex.replace("{}", ref_call, 1)
-            latex_code += (r"\subsection{Proof}" + "\n"
-                           + proof_latex)
-
-        latex_code += "\n"
-        if theorem.is_axiom():
-            self.axioms_latex += latex_code
-        else:
-            self.theorems_latex += latex_code
-
-    def add_all_theorems(self, module):
+            latex_code += [r"\subsection{Proof}", "\n"]
+            # The i-th "{}" of the proof refers to its i-th dependency.
+            dependencies = theorem.proof.dependencies
+            proof_parts = theorem.proof.latex_code.split("{}",
+                                                         len(dependencies))
+            latex_code.append(proof_parts[0])
+            for dependency, proof_part in zip(dependencies, proof_parts[1:]):
+                latex_code += [r"\ref{",
+                               str(self.labels[dependency.theorem_class]),
+                               "}", proof_part]
+
+        latex_code.append("\n")
+        return "".join(latex_code)
+
+    def add_all_theorems(self, module, jobs=1):
         """
         Adds all the theorems from a python module. This is a good way to be
         sure that every theorem has been taken; however, it is recommended to
         give some guidlines to the TheoremGroup when saving theorems, to have
-        some kind of structure in the document.
-        """
-        for _, obj in inspect.getmembers(sys.modules[module.__name__]):
-            if inspect.isclass(obj):
-                if issubclass(obj, thm.Theorem):
-                    self.add_theorem(obj)
+        some kind of structure in the document. Only the theorems defined in
+        the module are added (with their dependencies), in the order of
+        their names (see thm.module_theorem_classes()).
 
-    def save(self, file_name=None):
+        If jobs is not 1, the theorems are first verified in parallel using
+        jobs processes (None to use every core), see verification_scheduler.
         """
-        Uses the write_to_file() function present in latex_gestion.py.
+        theorems = thm.module_theorem_classes(module)
 
-        The file name must not have any file extension (no .pdf nor .tex). If
-        no file name is specified, uses the proof title after replacing
-        spaces by underscores.
+        if jobs != 1:
+            # The seed is taken from rng, so that fixing random.seed() still
+            # always gives the same document.
+            vs.verify_theorems(theorems, jobs, rng.getrandbits(32))
 
-        Note: there might be something happening if we try to save a document
-              without any theorem nor axiom.
+        for theorem in theorems:
+            self.add_theorem(theorem)
+
+    def get_file_name(self, file_name=None):
+        """
+        Returns the name of the file in which this group is saved, without
+        any extension. If no file name is specified, uses the proof title
+        after replacing spaces by underscores.
         """
         if file_name is None:
             file_name = self.title.replace(' ', '_')
         if len(file_name) > 4 and file_name[-4:] == '.tex':
             file_name = file_name[:-4]
+        return file_name
+
+    def get_manifest_path(self, file_name=None):
+        """
+        Returns the path of the manifest of the document saved in the file
+        given (see get_file_name()), in tex.RESULT_DIRECTORY.
+        """
+        return (tex.RESULT_DIRECTORY + '/' + self.get_file_name(file_name)
+                + MANIFEST_EXTENSION)
+
+    def load_manifest(self, file_name=None):
+        """
+        Loads the manifest saved with the document in the file given (see
+        get_file_name()), so that the sections that did not change are
+        reused. It must be loaded before adding theorems. Returns whether a
+        manifest was loaded.
+        """
+        import json  # pylint: disable=import-outside-toplevel
+
+        try:
+            with open(self.get_manifest_path(file_name), 'r',
+                      encoding='utf-8') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return False
+        if manifest.get('version') != MANIFEST_VERSION:
+            return False
+
+        self.previous_sections = manifest['sections']
+        self.used_labels.update(
+            section['label'] for section in self.previous_sections.values())
+        return True
+
+    def save_manifest(self, file_name=None):
+        """
+        Saves the manifest of the sections of this group, next to the
+        document saved in the file given (see get_file_name()).
+        """
+        import json  # pylint: disable=import-outside-toplevel
+
+        path = self.get_manifest_path(file_name)
+        temporary_path = path + ".tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': MANIFEST_VERSION,
+                       'sections': self.sections}, file, indent=1)
+        os.replace(temporary_path, path)
 
-        latex_code = tex.init_latex_code(self.title, self.author)
-        if self.axioms_latex != "":
-            latex_code += r"\part{Axioms}" + "\n"
-            latex_code += self.axioms_latex
-            latex_code += r"\newpage" + "\n\n"
-
-        if self.theorems_latex != "":
-            latex_code += r"\part{Theorems}"
-            latex_code += self.theorems_latex
-
-        if self.axioms_latex == self.theorems_latex == "":
-            latex_code = tex.concatenate_lines([r"\documentclass{article}",
-                                                r"\begin{document}",
-                                                ""])
-            latex_code += ("Since there is no proof to save, let me speak "
-                           "about 1729, the Hardy-Ramanujan number. It "
-                           "is clearly the greatest number.")
-            latex_code += (r"\begin{center}"
-                           + r"\textit{One number to rule them all,}\\"
-                           + r"\textit{One number to find them,}\\"
-                           + r"\textit{One number to bring them all}\\"
-                           + r"\textit{And in the darkness bind them.}\\"
-                           + r"\end{center}")
-
-        tex.write_to_file(latex_code, file_name, True)
+    def get_latex_fragments(self):
+        """
+        Generates the LaTeX code of the document, without its ending, one
+        fragment (mostly one section) at a time. This allows to write a
+        document with many sections without building it as one string.
+
+        Note: there might be something happening if we try to save a document
+              without any theorem nor axiom.
+        """
+        if not self.axioms_latex and not self.theorems_latex:
+            yield tex.concatenate_lines([r"\documentclass{article}",
+                                         r"\begin{document}",
+                                         ""])
+            yield ("Since there is no proof to save, let me speak "
+                   "about 1729, the Hardy-Ramanujan number. It "
+                   "is clearly the greatest number.")
+            yield (r"\begin{center}"
+                   + r"\textit{One number to rule them all,}\\"
+                   + r"\textit{One number to find them,}\\"
+                   + r"\textit{One number to bring them all}\\"
+                   + r"\textit{And in the darkness bind them.}\\"
+                   + r"\end{center}")
+            return
+
+        yield tex.init_latex_code(self.title, self.author)
+        if self.axioms_latex:
+            yield r"\part{Axioms}" + "\n"
+            yield from self.axioms_latex
+            yield r"\newpage" + "\n\n"
+
+        if self.theorems_latex:
+            yield r"\part{Theorems}"
+            yield from self.theorems_latex
+
+    def get_latex_code(self):
+        """
+        Returns the LaTeX code of the document, without its ending, as one
+        string (see get_latex_fragments()).
+        """
+        return "".join(self.get_latex_fragments())
+
+    def save(self, file_name=None, compile_pdf=True):
+        """
+        Uses the write_latex_file() and compile_latex() functions present in
+        latex_gestion.py.
+
+        The file name must not have any file extension (no .pdf nor .tex). If
+        no file name is specified, uses the proof title after replacing
+        spaces by underscores. If compile_pdf is False, only the .tex file is
+        written. The manifest of the sections is saved too (see
+        load_manifest()).
+        """
+        file_name = self.get_file_name(file_name)
+        with prof.stage("writing"):
+            latex_hash = tex.write_latex_file(self.get_latex_fragments(),
+                                              file_name, True)
+            self.save_manifest(file_name)
+        if compile_pdf:
+            with prof.stage("pdflatex"):
+                tex.compile_latex(file_name, latex_hash)
+
+
+def save_all(theorem_groups, file_names=None, jobs=None, compile_pdf=True):
+    """
+    Saves many theorem groups, compiling their documents at the same time
+    using at most jobs pdflatex processes (see tex.compile_all()). The file
+    names follow the same rules as in TheoremGroup.save(). Returns whether
+    each compilation succeeded.
+    """
+    if file_names is None:
+        file_names = [None]*len(theorem_groups)
+    file_names = [theorem_group.get_file_name(file_name)
+                  for theorem_group, file_name in zip(theorem_groups,
+                                                      file_names)]
+
+    with prof.stage("writing"):
+        latex_hashes = [tex.write_latex_file(
+                            theorem_group.get_latex_fragments(),
+                            file_name, True)
+                        for theorem_group, file_name in zip(theorem_groups,
+                                                            file_names)]
+        for theorem_group, file_name in zip(theorem_groups, file_names):
+            theorem_group.save_manifest(file_name)
+    if not compile_pdf:
+        return [True]*len(theorem_groups)
+    with prof.stage("pdflatex"):
+        return tex.compile_all(file_names, latex_hashes, jobs)
@@ -18,6 +18,10 @@ class RemovalOfParenthesis(thm.Equality):
     The order of the unknowns is the following: a.
     """
 
+    # Parenthesis around "or known" would look like they are the ones of
+    # this axiom.
+    or_known_in_parenthesis = False
+
     def __init__(self, param_list):
         super().__init__(param_list,
                          name="the removal of parenthesis",
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+Defines the VerificationCache class.
+
+A verification cache stores the result of the verification of theorems in a
+directory, as one small JSON record per theorem. Records are addressed by a
+hash of the source code of the theorem class (and of the modules doing the
+verification), and they remember the hash of every theorem they depend on.
+Thus, a theorem which did not change since the last run is loaded instead of
+being proven again, and editing a theorem only invalidates the theorems that
+depend on it.
+
+Created on Sat Oct 17 11:02:51 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+import ast
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import sys
+
+import evaluation
+import expression as expr
+import identity_check as identity
+import normal_form as nf
+import proof as proof_module
+import text_gestion as tg
+import theorem as thm
+
+
+# Changing one of those modules may change what is accepted as a proof, so
+# they are part of the hash of every theorem.
+CORE_MODULES = [tg, expr, nf, evaluation, identity, thm, proof_module]
+
+RECORD_EXTENSION = ".json"
+
+
+def hash_strings(strings):
+    """
+    Returns the SHA-256 hexadecimal digest of a list of strings.
+    """
+    digest = hashlib.sha256()
+    for string in strings:
+        digest.update(string.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+_CLASS_SOURCES = {}
+
+
+def get_module_class_sources(module_name):
+    """
+    Returns a dictionary giving the source code of every class defined in a
+    module, by qualified name. The module is parsed only once, since using
+    inspect.getsource() on each class would parse it again for every class.
+    """
+    if module_name in _CLASS_SOURCES:
+        return _CLASS_SOURCES[module_name]
+
+    sources = {}
+    module = sys.modules.get(module_name)
+    module_source = None if module is None else get_source(module)
+    if module_source is not None:
+        lines = module_source.splitlines(keepends=True)
+        to_visit = [(node, "") for node in ast.parse(module_source).body]
+        while to_visit:
+            node, prefix = to_visit.pop()
+            if isinstance(node, ast.ClassDef):
+                qualname = prefix + node.name
+                sources[qualname] = "".join(lines[node.lineno - 1:
+                                                  node.end_lineno])
+                to_visit.extend((child, qualname + ".")
+                                for child in node.body)
+
+    _CLASS_SOURCES[module_name] = sources
+    return sources
+
+
+def get_source(obj):
+    """
+    Returns the source code of a class or a module, or None if it cannot be
+    found (for classes created at runtime, for example).
+    """
+    if inspect.isclass(obj):
+        sources = get_module_class_sources(obj.__module__)
+        return sources.get(obj.__qualname__)
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        return None
+
+
+_CORE_HASH = []
+
+
+def core_hash():
+    """
+    Returns the hash of the source code of the CORE_MODULES.
+    """
+    if not _CORE_HASH:
+        _CORE_HASH.append(hash_strings(get_source(module) or module.__name__
+                                       for module in CORE_MODULES))
+    return _CORE_HASH[0]
+
+
+def qualified_name(theorem_class):
+    """
+    Returns the name of a theorem class, with the module defining it.
+    """
+    return theorem_class.__module__ + ":" + theorem_class.__qualname__
+
+
+def resolve_qualified_name(name):
+    """
+    Returns the class having the qualified_name() given, or None if it does
+    not exist anymore.
+    """
+    module_name, _, class_name = name.partition(":")
+    try:
+        obj = importlib.import_module(module_name)
+    except ImportError:
+        return None
+    for attribute in class_name.split("."):
+        obj = getattr(obj, attribute, None)
+        if obj is None:
+            return None
+    return obj
+
+
+def is_axiom_class(theorem_class):
+    """
+    Returns whether a theorem class is an axiom, meaning it does not
+    redefine get_proof().
+    """
+    return theorem_class.get_proof is thm.Theorem.get_proof
+
+
+class VerificationCache:
+    """
+    A cache of verified theorems, stored in a directory.
+
+    Attributes
+    **********
+    - directory: the directory in which the records are stored.
+    - theorem_hashes: the hashes computed during this run, by theorem class.
+                      The hash of a theorem covers its source code and the
+                      hashes of all its dependencies.
+    """
+
+    def __init__(self, directory):
+        """
+        Instanciates the attributes, and creates the directory if needed.
+        """
+        self.directory = directory
+        self.theorem_hashes = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def record_key(self, theorem_class):
+        """
+        Returns the key of the record of a theorem class, or None if its
+        source code cannot be found.
+        """
+        source = get_source(theorem_class)
+        if source is None:
+            return None
+        return hash_strings([core_hash(), qualified_name(theorem_class),
+                             source])
+
+    def record_path(self, key):
+        """
+        Returns the path of the record having the key given.
+        """
+        return os.path.join(self.directory, key + RECORD_EXTENSION)
+
+    def read_record(self, theorem_class):
+        """
+        Returns the record of a theorem class, or None if there is none.
+        """
+        key = self.record_key(theorem_class)
+        if key is None:
+            return None
+        try:
+            with open(self.record_path(key), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def theorem_hash(self, theorem_class, in_progress=None):
+        """
+        Returns the hash of a theorem class, covering its source code and
+        the hashes of its dependencies (as found in its record). Returns
+        None if it cannot be computed, in which case nothing depending on
+        this theorem can be cached.
+        """
+        if theorem_class in self.theorem_hashes:
+            return self.theorem_hashes[theorem_class]
+
+        if in_progress is None:
+            in_progress = set()
+        if theorem_class in in_progress:
+            return None
+
+        key = self.record_key(theorem_class)
+        if key is None:
+            return None
+
+        if is_axiom_class(theorem_class):
+            dependency_hashes = []
+        else:
+            record = self.read_record(theorem_class)
+            if record is None:
+                return None
+
+            in_progress.add(theorem_class)
+            dependency_hashes = []
+            for dependency in record['dependencies']:
+                dependency_class = resolve_qualified_name(dependency['theorem'])
+                if dependency_class is None:
+                    return None
+                dependency_hash = self.theorem_hash(dependency_class,
+                                                    in_progress)
+                if dependency_hash != dependency['hash']:
+                    return None
+                dependency_hashes.append(dependency_hash)
+            in_progress.discard(theorem_class)
+
+        result = hash_strings([key] + dependency_hashes)
+        self.theorem_hashes[theorem_class] = result
+        return result
+
+    def load(self, theorem):
+        """
+        Returns the proof of a theorem as it was stored during a previous
+        run, or None if there is no record or if it is not valid anymore.
+        """
+        theorem_class = type(theorem)
+        record = self.read_record(theorem_class)
+        if record is None or record['conclusion'] != theorem.conclusion:
+            return None
+        if self.theorem_hash(theorem_class) is None:
+            return None
+
+        dependencies = []
+        for dependency in record['dependencies']:
+            dependency_class = resolve_qualified_name(dependency['theorem'])
+            dependencies.append(thm.TheoremReference(
+                dependency_class, tuple(dependency['bindings'])))
+
+        return proof_module.Proof.restore(theorem, record['equalities'],
+                                          dependencies, record['latex_code'])
+
+    def store(self, theorem, proof):
+        """
+        Stores the proof of a theorem, if it is finished and if the hashes
+        of the theorem and of all its dependencies can be computed.
+        """
+        if proof is None or not proof.is_finished:
+            return
+
+        theorem_class = type(theorem)
+        key = self.record_key(theorem_class)
+        if key is None:
+            return
+
+        dependencies = []
+        for dependency in proof.dependencies:
+            dependency_class = dependency.theorem_class
+            dependency_hash = self.theorem_hash(dependency_class)
+            if dependency_hash is None:
+                return
+            dependencies.append({'theorem': qualified_name(dependency_class),
+                                 'bindings': list(dependency.bindings),
+                                 'hash': dependency_hash})
+
+        record = {'theorem': qualified_name(theorem_class),
+                  'conclusion': theorem.conclusion,
+                  'equalities': proof.equalities,
+                  'dependencies': dependencies,
+                  'latex_code': proof.latex_code}
+
+        path = self.record_path(key)
+        temporary_path = path + ".tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(record, file, indent=1)
+        os.replace(temporary_path, path)
+
+        self.theorem_hashes.pop(theorem_class, None)
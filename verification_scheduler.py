@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Gives functions to verify many theorems in parallel.
+
+The dependencies of a theorem are found by looking at the theorems named in
+its get_proof() method. This gives a dependency graph, and the theorems
+that do not depend on each other are verified at the same time, in
+different processes. A theorem is only verified once all its dependencies
+are, and their proofs are given to the process verifying it so that it does
+not need to verify them again.
+
+Created on Sat Oct 17 13:40:07 2026
+@author: Joachim Favre & Alberts Reisons
+"""
+import random as rng
+
+import theorem as thm
+import theorem_graph as tgraph
+
+
+def build_dependency_graph(theorem_classes):
+    """
+    Returns a tgraph.TheoremGraph holding the static dependencies of every
+    theorem class given and of all their (recursive) dependencies.
+    """
+    graph = tgraph.TheoremGraph()
+    for theorem_class in theorem_classes:
+        graph.add_static_dependencies(theorem_class)
+    return graph
+
+
+def verify_theorem(theorem_class, known_proofs, seed=None):
+    """
+    Verifies a theorem class, knowing the proofs of its dependencies, and
+    returns its proof. This is what each worker process runs.
+
+    If a seed is given, the random generator is seeded using it and the
+    name of the theorem class, so that the LaTeX code of a proof does not
+    depend on the process verifying it nor on the order of verification.
+    Its state is restored afterwards, so that verifying theorems in this
+    process does not change the random numbers drawn after it.
+    """
+    for known_class, known_proof in known_proofs.items():
+        thm.VERIFIED_PROOFS.setdefault(known_class, known_proof)
+
+    if seed is None:
+        return theorem_class(None).proof
+
+    state = rng.getstate()
+    rng.seed("{}:{}".format(seed, theorem_class.__qualname__))
+    try:
+        return theorem_class(None).proof
+    finally:
+        rng.setstate(state)
+
+
+def dependency_closure(theorem_class, graph):
+    """
+    Returns the set of the (recursive) dependencies of a theorem class.
+    """
+    closure = set()
+    to_visit = list(graph.dependencies(theorem_class))
+    while to_visit:
+        dependency = to_visit.pop()
+        if dependency not in closure:
+            closure.add(dependency)
+            to_visit.extend(graph.dependencies(dependency))
+    return closure
+
+
+def verify_theorems(theorem_classes, jobs=None, seed=None):
+    """
+    Verifies theorem classes and all their dependencies, using jobs worker
+    processes (None to use every core, 1 to verify them in this process).
+    Every theorem is verified after all of its dependencies. The proofs are
+    then added to thm.VERIFIED_PROOFS in a deterministic order (sorted by
+    module and class name), whatever order the workers finished in.
+
+    Theorems which depend on each other can never be verified; a
+    thm.TheoremRecursionError giving their cycle is then raised.
+    """
+    graph = build_dependency_graph(theorem_classes)
+    order = sorted(graph.edges, key=lambda theorem_class: (
+        theorem_class.__module__, theorem_class.__qualname__))
+    position = {theorem_class: index
+                for index, theorem_class in enumerate(order)}
+
+    verified = {theorem_class: thm.VERIFIED_PROOFS[theorem_class]
+                for theorem_class in order
+                if theorem_class in thm.VERIFIED_PROOFS}
+
+    # Number of dependencies that are not verified yet, and theorems to
+    # update when a theorem gets verified.
+    remaining = {}
+    dependents = {theorem_class: [] for theorem_class in order}
+    for theorem_class in order:
+        dependencies = set(graph.dependencies(theorem_class))
+        remaining[theorem_class] = len(dependencies - verified.keys())
+        for dependency in dependencies:
+            dependents[dependency].append(theorem_class)
+
+    ready = [theorem_class for theorem_class in order
+             if theorem_class not in verified
+             and remaining[theorem_class] == 0]
+
+    def mark_verified(theorem_class, proof):
+        """
+        Stores the proof of a theorem, and adds the theorems waiting only
+        for this one to the ready list.
+        """
+        verified[theorem_class] = proof
+        for dependent in dependents[theorem_class]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0 and dependent not in verified:
+                ready.append(dependent)
+
+    if jobs == 1:
+        while ready:
+            theorem_class = ready.pop(0)
+            mark_verified(theorem_class,
+                          verify_theorem(theorem_class, {}, seed))
+    else:
+        # Only imported here, since it takes longer to import than the rest
+        # of the program.
+        # pylint: disable-next=import-outside-toplevel
+        from concurrent.futures import (ProcessPoolExecutor, FIRST_COMPLETED,
+                                        wait)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            running = {}
+            while ready or running:
+                for theorem_class in ready:
+                    known_proofs = {dependency: verified[dependency]
+                                    for dependency in dependency_closure(
+                                        theorem_class, graph)}
+                    future = executor.submit(verify_theorem, theorem_class,
+                                             known_proofs, seed)
+                    running[future] = theorem_class
+                ready.clear()
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                # Sorted so that theorems become ready in the same order,
+                # whatever order the workers finished in.
+                for future in sorted(done, key=lambda future:
+                                     position[running[future]]):
+                    theorem_class = running.pop(future)
+                    mark_verified(theorem_class, future.result())
+
+    for theorem_class in order:
+        if theorem_class not in verified:
+            raise thm.TheoremRecursionError(graph.find_cycle(theorem_class))
+
+    for theorem_class in order:
+        thm.VERIFIED_PROOFS.setdefault(theorem_class, verified[theorem_class])
+    return [verified[theorem_class] for theorem_class in theorem_classes]